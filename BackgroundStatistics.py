@@ -0,0 +1,60 @@
+import csv
+import numpy as np
+
+# number of csv rows merged into the running statistics at a time
+BLOCK_ROWS = 4096
+
+# Finds the average and variance of background columns in a single pass over
+# the source file without keeping the columns in memory. Rows are read in
+# blocks and every block is merged into running per column means and sums of
+# squared differences from the mean (Chan et al.), which stays accurate where
+# summing the values and their squares would not.
+class BackgroundStatistics:
+    def __init__(self, filename, columns):
+        self.filename = filename
+        self.columns = columns
+        self.count = 0
+        self.mean = np.zeros(len(columns))
+        self.sumSquares = np.zeros(len(columns))
+        self.readFile()
+
+    def readFile(self):
+        with open(self.filename, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            sourceIndex = {fieldname: i for i, fieldname in enumerate(next(reader))}
+            indices = [sourceIndex[column] for column in self.columns]
+            width = max(indices) + 1 if len(indices) > 0 else 0
+
+            block = []
+            for row in reader:
+                # blank lines are skipped the same way DataExtractor does
+                if len(row) == 0:
+                    continue
+                if len(row) < width:
+                    row = row + [''] * (width - len(row))
+                block.append([row[i] if row[i] != '' else 'nan' for i in indices])
+                if len(block) == BLOCK_ROWS:
+                    self.addBlock(np.array(block, dtype=np.float64))
+                    block = []
+            if len(block) > 0:
+                self.addBlock(np.array(block, dtype=np.float64))
+
+    # block is a (rows, columns) array
+    def addBlock(self, block):
+        blockCount = block.shape[0]
+        blockMean = block.mean(axis=0)
+        blockSumSquares = ((block - blockMean) ** 2).sum(axis=0)
+
+        total = self.count + blockCount
+        delta = blockMean - self.mean
+        self.mean = self.mean + delta * (blockCount / total)
+        self.sumSquares = self.sumSquares + blockSumSquares + delta ** 2 * (self.count * blockCount / total)
+        self.count = total
+
+    # returns [(column, average, variance)] with the population variance like
+    # np.var gives
+    def getResults(self):
+        if self.count == 0:
+            return [(column, np.nan, np.nan) for column in self.columns]
+        variance = self.sumSquares / self.count
+        return [(column, self.mean[i], variance[i]) for i, column in enumerate(self.columns)]
\ No newline at end of file
@@ -0,0 +1,227 @@
+import BirdData
+import DataExtractor
+import PeakAnalyzer
+import PlotDataWriter
+import BackgroundDataWriter
+import BackgroundStatistics
+import PlotRenderer
+import SQLiteDataWriter
+import csv
+import os
+import shutil
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Every column is analyzed on its own so the work is spread over a pool of
+# worker processes. Each worker keeps the file it is currently working on open
+# so that the columns of the same file don't need to be reread.
+currentExtractor = (None, None)
+
+def getExtractor(filename, extractorOptions):
+    global currentExtractor
+    if currentExtractor[0] != filename:
+        currentExtractor = (filename, BirdData.openDataExtractor(filename, **extractorOptions))
+    return currentExtractor[1]
+
+# Every worker would parse and hold its own copy of each file, so with several
+# workers each file is parsed once into the memory mapped cache that all of
+# them share. Without --cache the cache goes to a temporary directory that only
+# lasts for the run. Returns (extractorOptions, temporaryCache), the caller
+# removes temporaryCache once the workers are done.
+def shareExtractorCache(extractorOptions, workers):
+    if workers <= 1 or extractorOptions['lazy']:
+        return (extractorOptions, None)
+    if extractorOptions['cache'] or extractorOptions['cacheDirectory'] != None:
+        return (extractorOptions, None)
+    temporaryCache = tempfile.mkdtemp(prefix='batch_cache_')
+    return ({**extractorOptions, 'cacheDirectory': temporaryCache}, temporaryCache)
+
+# parses a file into the cache, one task per file so they are parsed in parallel
+def buildCache(task):
+    filename, extractorOptions = task
+    try:
+        BirdData.openDataExtractor(filename, **extractorOptions)
+    except Exception as e:
+        print("ERROR: Could not cache " + filename)
+        print(e)
+
+# returns (column, valid, brokenIdx, error, results) where results is None for
+# columns that failed validation
+def analyzeColumn(task):
+    filename, column, extractorOptions, analyzerOptions, imageOptions = task
+    try:
+        xData, yData = getExtractor(filename, extractorOptions).extractData(column)
+        analyzer = PeakAnalyzer.PeakAnalyzer(False, **analyzerOptions)
+        if not analyzer.setData(column, xData, yData):
+            return (column, False, -1, 'invalid_column_name', None)
+
+        analyzer.analyze()
+        valid, brokenIdx, error = analyzer.validateMinMax()
+
+        if imageOptions != None:
+            saveImage(analyzer, valid, brokenIdx, **imageOptions)
+
+        return (column, valid, brokenIdx, error, analyzer.getResults() if valid else None)
+    except Exception as e:
+        print("ERROR: Could not analyze " + column + " of " + filename)
+        print(e)
+        return (column, False, -1, 'analysis_error', None)
+
+# returns [(column, average, variance)] for all of the columns of the file,
+# which are read in one pass without parsing the rest of the file
+def analyzeBackgroundFile(task):
+    filename, columns = task
+    try:
+        return BackgroundStatistics.BackgroundStatistics(filename, columns).getResults()
+    except Exception as e:
+        print("ERROR: Could not process the background columns of " + filename)
+        print(e)
+        return []
+
+def saveImage(analyzer, valid, brokenIdx, imageDirectory, format='png', dpi=None):
+    minimums, maximums = analyzer.peaks.ordered()
+    try:
+        PlotRenderer.renderColumn(os.path.join(imageDirectory, analyzer.column + '.' + format), analyzer.xData, analyzer.yData,
+                                  minimums, maximums, analyzer.title(), valid, brokenIdx, format=format, dpi=dpi)
+    except Exception as e:
+        print("Could not save " + analyzer.column + " plot!")
+        print(e)
+
+# Runs the automatic interpretation on every selected column of every source
+# file without showing any plots. Columns that pass validation are written to
+# plot_data.csv, the rest are listed in flagged_columns.csv so they can be
+# fixed by hand. Results are always written in column order no matter which
+# worker finished first. With sqlitePath the results of every file are also
+# added to that database.
+class BatchProcessor:
+    def __init__(self, filenames, columns=None, background=False, outputDirectory=None, startColumn=None, saveImages=True, workers=None, prominenceMode='single', float32=False, cache=False, cacheDirectory=None, lazy=False, memoryBudget=None, imageFormat='png', dpi=None, outputFormats=(), sqlitePath=None):
+        self.background = background
+        self.workers = workers if workers != None else os.cpu_count()
+        self.extractorOptions = {
+            'float32': float32,
+            'cache': cache,
+            'cacheDirectory': cacheDirectory,
+            'lazy': lazy,
+            'memoryBudget': memoryBudget
+        }
+        self.analyzerOptions = {
+            'prominenceMode': prominenceMode
+        }
+        self.dtype = np.float32 if float32 else np.float64
+        self.outputFormats = outputFormats
+        self.imageFormat = imageFormat
+        self.dpi = dpi
+        self.sqliteDataWriter = SQLiteDataWriter.SQLiteDataWriter(sqlitePath) if sqlitePath != None else None
+
+        # (filename, outputDirectory, imageDirectory, columns)
+        self.sources = []
+        for filename in filenames:
+            if len(filenames) == 1 or outputDirectory == None:
+                sourceOutputDirectory = outputDirectory
+            else:
+                sourceOutputDirectory = os.path.join(outputDirectory, os.path.basename(filename) + '_results')
+
+            try:
+                availableColumns = DataExtractor.readAvailableColumns(filename)
+            except Exception as e:
+                print("ERROR: There was an error opening ", filename)
+                print(e)
+                continue
+            availableColumns = list(filter(lambda val: val.endswith('B') == background, availableColumns))
+
+            # a file without the selected columns is passed over, the others are
+            # still processed
+            sourceColumns, error = BirdData.findColumns(availableColumns, columns, startColumn)
+            if error != None:
+                print("ERROR: Skipping " + filename + ". " + error)
+                continue
+
+            # background columns only produce statistics so there is nothing to plot
+            sourceOutputDirectory, imageDirectory = BirdData.createOutputDirectory(filename, sourceOutputDirectory, saveImages and not background)
+            self.sources.append((filename, sourceOutputDirectory, imageDirectory, sourceColumns))
+
+        # background files are read in a single pass without the extractor
+        temporaryCache = None
+        if not background:
+            self.extractorOptions, temporaryCache = shareExtractorCache(self.extractorOptions, self.workers)
+
+        try:
+            if self.workers > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    self.process(executor.map)
+            else:
+                self.process(map)
+        finally:
+            if temporaryCache != None:
+                shutil.rmtree(temporaryCache, ignore_errors=True)
+
+        if self.sqliteDataWriter != None:
+            self.sqliteDataWriter.close()
+
+    def process(self, mapFunction):
+        # background files are handled as a whole, one file per worker
+        if self.background:
+            results = mapFunction(analyzeBackgroundFile, [(filename, columns) for filename, _, _, columns in self.sources])
+            for (filename, outputDirectory, _, _), sourceResults in zip(self.sources, results):
+                self.writeBackground(filename, outputDirectory, sourceResults)
+            return
+
+        # the caches are built before any column is analyzed so no worker
+        # parses a file itself
+        if self.workers > 1 and not self.extractorOptions['lazy']:
+            list(mapFunction(buildCache, [(filename, self.extractorOptions) for filename, _, _, _ in self.sources]))
+
+        tasks = []
+        for filename, _, imageDirectory, columns in self.sources:
+            imageOptions = None if imageDirectory == None else {'imageDirectory': imageDirectory, 'format': self.imageFormat, 'dpi': self.dpi}
+            tasks.extend((filename, column, self.extractorOptions, self.analyzerOptions, imageOptions) for column in columns)
+
+        results = mapFunction(analyzeColumn, tasks)
+
+        # results come back in the same order as the tasks so each file is
+        # written as soon as its last column is done
+        for filename, outputDirectory, _, columns in self.sources:
+            sourceResults = [next(results) for _ in columns]
+            self.writePlots(filename, outputDirectory, sourceResults)
+
+    def writePlots(self, filename, outputDirectory, sourceResults):
+        plotDataWriter = PlotDataWriter.PlotDataWriter(dtype=self.dtype, outputFormats=self.outputFormats)
+        flagged = []
+
+        for column, valid, brokenIdx, error, results in sourceResults:
+            if not valid:
+                flagged.append((column, error, brokenIdx))
+                continue
+            minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration = results
+            plotDataWriter.addLine(column, False, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration)
+
+        plotDataWriter.writeToFile(outputDirectory)
+        if self.sqliteDataWriter != None:
+            self.sqliteDataWriter.writePlotData(filename, outputDirectory, plotDataWriter)
+        self.writeFlaggedColumns(outputDirectory, flagged)
+
+        print(filename + ": " + str(len(sourceResults) - len(flagged)) + " of " + str(len(sourceResults)) + " columns passed validation.")
+        if len(flagged) > 0:
+            print("Columns that need to be checked by hand: " + ' '.join(x[0] for x in flagged))
+
+    def writeBackground(self, filename, outputDirectory, sourceResults):
+        backgroundDataWriter = BackgroundDataWriter.BackgroundDataWriter()
+        for column, average, variance in sourceResults:
+            backgroundDataWriter.writeLine(column, average, variance)
+        backgroundDataWriter.writeToFile(outputDirectory)
+        if self.sqliteDataWriter != None:
+            self.sqliteDataWriter.writeBackgroundData(filename, outputDirectory, backgroundDataWriter)
+        print("Background data processing completed.")
+
+    def writeFlaggedColumns(self, outputDirectory, flagged):
+        output = os.path.join(outputDirectory, 'flagged_columns.csv')
+        try:
+            with open(output, mode='w') as csv_file:
+                writer = csv.writer(csv_file, lineterminator='\n')
+                writer.writerow(['Series', 'Error', 'Index'])
+                for row in flagged:
+                    writer.writerow(row)
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
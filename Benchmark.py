@@ -0,0 +1,179 @@
+import SyntheticData
+import DataExtractor
+import PeakAnalyzer
+import PlotDataWriter
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Times every stage of the pipeline on synthetic recordings of a few sizes and
+# writes the results to a json file, so runs before and after a change can be
+# compared. Each stage is run repeat times and the fastest and median times in
+# seconds are kept.
+#
+# The startup benchmark runs python in a new process for every measurement so
+# nothing is already imported. It also checks that the modules of the
+# non-interactive modes don't pull in pyplot or scipy on import, which is
+# what made them slow to start.
+
+# modules that are slow to import and only needed by some modes
+heavyModules = ['matplotlib', 'matplotlib.pyplot', 'scipy.signal']
+
+# (name, code, heavy modules the code is allowed to import)
+startupCases = [
+    ('help', "import runpy, sys; sys.argv = ['main.py', '--help']; runpy.run_path('main.py', run_name='__main__')", []),
+    ('import_batch', "import BatchProcessor", []),
+    ('import_watch', "import FolderWatcher", []),
+    ('import_interactive', "import BirdData", []),
+    ('import_plot', "import DataPlot", heavyModules)
+]
+
+def timeStage(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'runs': repeat}
+
+# returns a fresh analyzer for every column with the data already set
+def createAnalyzers(dataExtractor, columns):
+    analyzers = []
+    for column in columns:
+        analyzer = PeakAnalyzer.PeakAnalyzer(False)
+        analyzer.setData(column, *dataExtractor.extractData(column))
+        analyzers.append(analyzer)
+    return analyzers
+
+def benchmarkSize(directory, rows, width, repeat):
+    path = os.path.join(directory, 'synthetic_' + str(rows) + 'x' + str(width) + '.csv')
+    SyntheticData.SyntheticData(rows=rows, width=width).writeCsv(path)
+
+    dataExtractor = DataExtractor.DataExtractor(path)
+    columns = dataExtractor.getAvailableColumns('plot')
+
+    def determineProminences():
+        for analyzer in createAnalyzers(dataExtractor, columns):
+            analyzer.determineMaxProminence()
+            analyzer.determineMinProminence()
+
+    # the prominences are found once up front so only the interpretation is timed
+    analyzers = createAnalyzers(dataExtractor, columns)
+    for analyzer in analyzers:
+        analyzer.determineMaxProminence()
+        analyzer.determineMinProminence()
+
+    def interpret():
+        for analyzer in analyzers:
+            analyzer.attemptAutomaticDataInterpretation()
+
+    interpret()
+    results = [analyzer.getResults() for analyzer in analyzers]
+
+    # the peaks keep their statistics until they are edited, so the cache is
+    # dropped to time working them out
+    def computeStatistics():
+        for analyzer in analyzers:
+            analyzer.peaks.edited()
+            analyzer.getResults()
+
+    def writeOutput():
+        plotDataWriter = PlotDataWriter.PlotDataWriter()
+        for column, (minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration) in zip(columns, results):
+            plotDataWriter.addLine(column, False, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration)
+        plotDataWriter.writeToFile(directory)
+
+    stages = {
+        'load': timeStage(lambda: DataExtractor.DataExtractor(path), repeat),
+        'extract': timeStage(lambda: [dataExtractor.extractData(column) for column in columns], repeat),
+        'prominence': timeStage(determineProminences, repeat),
+        'interpretation': timeStage(interpret, repeat),
+        'statistics': timeStage(computeStatistics, repeat),
+        'output': timeStage(writeOutput, repeat)
+    }
+    return {
+        'rows': rows,
+        'width': width,
+        'fileBytes': os.path.getsize(path),
+        'validColumns': sum(1 for analyzer in analyzers if analyzer.validateMinMax()[0]),
+        'stages': stages
+    }
+
+def timeStartup(code, repeat):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+
+    # the modules are listed on exit so code that ends in sys.exit, like
+    # --help, is checked as well
+    check = ("import atexit, sys\n"
+             "atexit.register(lambda: print('loaded: ' + ' '.join(x for x in " + repr(heavyModules) + " if x in sys.modules), file=sys.stderr))\n" + code)
+    output = subprocess.run([sys.executable, '-c', check], cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    loaded = [x for line in output.splitlines() if line.startswith('loaded: ') for x in line[len('loaded: '):].split()]
+    return {'min': min(times), 'median': statistics.median(times), 'runs': repeat, 'heavyModules': loaded}
+
+# returns (results, problems) where problems lists the cases that imported
+# more than they should
+def benchmarkStartup(repeat):
+    results = {}
+    problems = []
+    for name, code, allowed in startupCases:
+        results[name] = timeStartup(code, repeat)
+        unexpected = [x for x in results[name]['heavyModules'] if x not in allowed]
+        if len(unexpected) > 0:
+            problems.append(name + " imports " + ', '.join(unexpected))
+    return (results, problems)
+
+def runBenchmarks(sizes, width, repeat):
+    directory = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        results = []
+        for rows in sizes:
+            print("Benchmarking " + str(rows) + " rows x " + str(width) + " columns")
+            results.append(benchmarkSize(directory, rows, width, repeat))
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(allow_abbrev=False)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="Numbers of rows of the synthetic recordings.")
+    parser.add_argument('--width', type=int, default=24, help="Number of data columns, each one also gets a background column.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of times every stage is run.")
+    parser.add_argument('-o', '--output', type=str, default='benchmark_results.json', help="File to write the results to.")
+    parser.add_argument('--startup-only', action='store_true', default=False, help="Only run the startup benchmark.")
+    args = vars(parser.parse_args())
+
+    startup, problems = benchmarkStartup(args['repeat'])
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'startup': startup,
+        'results': [] if args['startup_only'] else runBenchmarks(args['sizes'], args['width'], args['repeat'])
+    }
+
+    with open(args['output'], mode='w') as outputFile:
+        json.dump(report, outputFile, indent=2)
+
+    print("startup: " + ', '.join(name + ' ' + format(case['median'], '.4f') + 's' for name, case in startup.items()))
+    for result in report['results']:
+        print(str(result['rows']) + " rows: " + ', '.join(name + ' ' + format(stage['median'], '.4f') + 's' for name, stage in result['stages'].items()))
+    print("Results written to " + args['output'])
+
+    # a heavy import creeping into a mode that doesn't need it fails the run
+    if len(problems) > 0:
+        print("ERROR: " + '; '.join(problems))
+        sys.exit(1)
\ No newline at end of file
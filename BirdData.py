@@ -1,85 +1,122 @@
-import DataPlot
 import DataExtractor
+import DataCache
+import LazyDataExtractor
 import PlotDataWriter
-import BackgroundDataWriter
+import SQLiteDataWriter
+import ColumnPrefetcher
+import ImageWriter
+import InteractionRecorder
+import Timing
 import sys, os, time
 from pathlib import Path
 import numpy as np
 
+# opens the source file with the requested storage options
+def openDataExtractor(filename, float32=False, cache=False, cacheDirectory=None, lazy=False, memoryBudget=None):
+    dtype = np.float32 if float32 else np.float64
+    if lazy:
+        return LazyDataExtractor.LazyDataExtractor(filename, dtype=dtype, memoryBudget=memoryBudget)
+    dataCache = DataCache.DataCache(cacheDirectory) if cache or cacheDirectory != None else None
+    return DataExtractor.DataExtractor(filename, dtype=dtype, cache=dataCache)
+
+# returns (outputDirectory, imageDirectory)
+# an existing output directory is only reused when resuming
+def createOutputDirectory(filename, outputDirectory, saveImages, resume=False):
+    imageDirectory = None
+    try:
+        if outputDirectory == None:
+            filename = os.path.basename(filename) + '_results_'  + str(int(time.time()))
+            outputDirectory = os.path.join(os.getcwd(), filename)
+
+        # don't allow overwriting of directories
+        if os.path.exists(outputDirectory) and not resume:
+            print("ERROR: Output directory already exists. Choose another directory or remove the exisiting output directory before continuing.")
+            sys.exit()
+
+        # attempt to make the output directory if it doesn't exist
+        if not os.path.exists(outputDirectory):
+            os.makedirs(outputDirectory)
+        # attempt to add the image directory if it's required
+        if saveImages:
+            imageDirectory = os.path.join(outputDirectory, 'plots')
+            if not os.path.exists(imageDirectory):
+                os.makedirs(imageDirectory)
+
+        print("Files will be output to: " + outputDirectory)
+    except Exception as e:
+        print("There was a problem creating the output directories.")
+        print(e)
+        sys.exit()
+    return (outputDirectory, imageDirectory)
+
+# returns (columnsToPlot, error) where error is None when the columns are valid
+def findColumns(availablePlotColumns, columns, startColumn):
+    #Ensure that the column names are valid
+    if columns != None:
+        errorColumns = []
+        for column in columns:
+            if not column in availablePlotColumns:
+                errorColumns.append(column)
+        if len(errorColumns) != 0:
+            return ([], "Fatal Error! these column(s) do not exist for this mode: " + ', '.join(x for x in errorColumns))
+        columnsToPlot = columns
+    elif startColumn != None:
+        if startColumn not in availablePlotColumns:
+            return ([], "Start column: " + startColumn + " was not found.")
+        columnsToPlot = availablePlotColumns[availablePlotColumns.index(startColumn):]
+    else:
+        columnsToPlot = availablePlotColumns
+
+    if len(columnsToPlot) == 0:
+        return ([], "No columns to plot.")
+    return (columnsToPlot, None)
+
+def selectColumns(availablePlotColumns, columns, startColumn):
+    columnsToPlot, error = findColumns(availablePlotColumns, columns, startColumn)
+    if error != None:
+        print(error)
+        sys.exit()
+    return columnsToPlot
+
 class BirdData:
-    def __init__(self, filename, columns=None, background=False, outputDirectory=None, startColumn=None, saveImages=True):
-        self.dataExtractor = DataExtractor.DataExtractor(filename)
-        self.plotDataWriter = PlotDataWriter.PlotDataWriter()
+    def __init__(self, filename, columns=None, background=False, outputDirectory=None, startColumn=None, saveImages=True, float32=False, cache=False, cacheDirectory=None, lazy=False, memoryBudget=None, prominenceMode='single', prefetch=1, prefetchPrevious=False, imageFormat='png', dpi=None, resume=False, outputFormats=(), sqlitePath=None, recordPath=None):
+        self.filename = filename
+        self.dataExtractor = openDataExtractor(filename, float32=float32, cache=cache, cacheDirectory=cacheDirectory, lazy=lazy, memoryBudget=memoryBudget)
         self.saveImages = saveImages
-        self.dataPlot = DataPlot.DataPlot(self.done, self.skip, self.dump, self.exit, self.prev, background)
+        # pyplot is only imported once a plot is actually shown, the batch and
+        # watch modes use the helpers above without it
+        import DataPlot
+        self.dataPlot = DataPlot.DataPlot(self.done, self.skip, self.dump, self.exit, self.prev, background, prominenceMode=prominenceMode)
         self.background = background
+        self.recorder = InteractionRecorder.InteractionRecorder(recordPath, filename, background=background, prominenceMode=prominenceMode) if recordPath != None else None
+        self.dataPlot.recorder = self.recorder
         availablePlotColumns = self.dataExtractor.getAvailableColumns('background' if background else 'plot')
 
-
-        try:
-            if outputDirectory == None:
-                filename = os.path.basename(filename) + '_results_'  + str(int(time.time()))
-                self.outputDirectory = os.path.join(os.getcwd(), filename)
-            else:
-                self.outputDirectory = outputDirectory
-
-            # don't allow overwriting of directories
-            if os.path.exists(self.outputDirectory):
-                print("ERROR: Output directory already exists. Choose another directory or remove the exisiting output directory before continuing.")
-                sys.exit()
-
-            # attempt to make the output directory if it doesn't exist
-            if not os.path.exists(self.outputDirectory):
-                os.makedirs(self.outputDirectory)
-            # attempt to add the image directory if it's required
-            if saveImages:
-                self.imageDirectory = os.path.join(self.outputDirectory, 'plots')
-                if not os.path.exists(self.imageDirectory):
-                    os.makedirs(self.imageDirectory)
-
-            print("Files will be output to: " + self.outputDirectory)
-        except Exception as e:
-            print("There was a problem creating the output directories.")
-            print(e)
-            sys.exit()
-
-        # availableBackgroundcolumns = self.dataExtractor.getAvailableColumns('background')
-        #
-        # backgroundDataWriter = BackgroundDataWriter.BackgroundDataWriter()
-        # for column in availableBackgroundcolumns:
-        #     _, yData = self.dataExtractor.extractData(column)
-        #     backgroundDataWriter.writeLine(column, sum(yData) / len(yData), np.var(yData))
-        # backgroundDataWriter.writeToFile(self.outputDirectory)
-        # print("Background data processing completed.")
-
-        #Ensure that the column names are valid
-        if columns != None:
-            errorColumns = []
-            for column in columns:
-                if not column in availablePlotColumns:
-                    errorColumns.append(column)
-            if len(errorColumns) != 0:
-                print("Fatal Error! these column(s) do not exist for this mode: " + ', '.join(x for x in errorColumns))
-                sys.exit()
-            self.columnsToPlot = columns
-        elif startColumn != None:
-            try:
-                idx = availablePlotColumns.index(startColumn)
-                self.columnsToPlot = availablePlotColumns[idx:]
-            except:
-                print("Start column: " + startColumn + " was not found.")
+        self.outputDirectory, self.imageDirectory = createOutputDirectory(filename, outputDirectory, saveImages, resume=resume)
+        self.plotDataWriter = PlotDataWriter.PlotDataWriter(journalDirectory=self.outputDirectory, dtype=np.float32 if float32 else np.float64, outputFormats=outputFormats)
+        # columns finished in an earlier session are passed over by Next and
+        # Skip but can still be reached with Prev
+        self.completedColumns = set(self.plotDataWriter.getColumns())
+        if len(self.completedColumns) > 0:
+            print("Resuming, " + str(len(self.completedColumns)) + " column(s) were already completed.")
+        self.sqliteDataWriter = SQLiteDataWriter.SQLiteDataWriter(sqlitePath) if sqlitePath != None else None
+        self.imageWriter = ImageWriter.ImageWriter(self.imageDirectory, format=imageFormat, dpi=dpi) if saveImages else None
+
+        self.columnsToPlot = selectColumns(availablePlotColumns, columns, startColumn)
+
+        if prefetch > 0 or prefetchPrevious:
+            self.prefetcher = ColumnPrefetcher.ColumnPrefetcher(self.dataExtractor, self.columnsToPlot, background, lookAhead=prefetch,
+                                                                lookBehind=1 if prefetchPrevious else 0, prominenceMode=prominenceMode,
+                                                                skipColumns=self.completedColumns)
         else:
-            self.columnsToPlot = availablePlotColumns
+            self.prefetcher = None
 
-        if len(self.columnsToPlot) == 0:
-            print("No columns to plot. Exiting.")
-            sys.exit()
-
-        self.currentPlotIndex = 0
+        self.currentPlotIndex = -1
+        self.advance()
 
         self.printGuide()
 
-        self.plotNext()
+        self.run()
 
     def printGuide(self):
         print("Usage Guide:")
@@ -92,40 +129,95 @@ class BirdData:
         print("To force output of a row, hold 't' while clicking on 'Next'")
 
 
-    def plotNext(self):
-        if self.currentPlotIndex < len(self.columnsToPlot):
-            column = self.columnsToPlot[self.currentPlotIndex]
-            xData, yData = self.dataExtractor.extractData(column)
-            title = 'Finish' if len(self.columnsToPlot) - 1 == self.currentPlotIndex else 'Next'
-            saved, forced = self.plotDataWriter.getColumnStatus(column)
-            self.dataPlot.initializePlot(column, xData, yData, saved, forced, doneButtonTitle=title)
+    # Shows one column at a time and waits in the plot's event loop until the
+    # operator moves on. The button callbacks only record where to go next and
+    # stop the loop, so the stack stays the same depth however many columns are
+    # visited, and the data of the column that was left is released before the
+    # next one is loaded. Closing the window ends the session like Exit does.
+    def run(self):
+        while self.currentPlotIndex < len(self.columnsToPlot):
+            self.showColumn()
+            self.navigation = None
+            self.dataPlot.waitForAction()
+            self.dataPlot.releaseColumn()
+
+            if self.navigation == 'next':
+                self.advance()
+            elif self.navigation == 'prev':
+                self.currentPlotIndex -= 1
+            else:
+                break
+        self.finish()
+
+    def showColumn(self):
+        column = self.columnsToPlot[self.currentPlotIndex]
+        Timing.timer.setColumn(column)
+        analysis = None
+        if self.prefetcher != None:
+            with Timing.timer.measure('prefetch_wait'):
+                analysis = self.prefetcher.get(self.currentPlotIndex)
+            # the neighbours are analyzed while this column is being edited
+            self.prefetcher.prefetch(self.currentPlotIndex)
+        if analysis != None:
+            xData, yData = analysis['xData'], analysis['yData']
         else:
-            self.plotDataWriter.writeToFile(self.outputDirectory)
-            sys.exit()
-
-    def done(self, column, forced, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevWidth, plt):
-        try:
-            if self.saveImages:
-                plt.savefig(os.path.join(self.imageDirectory, column+'.png'))
-        except Exception as e:
-            print("Could not save " + column + " plot!")
-            print(e)
+            with Timing.timer.measure('extract'):
+                xData, yData = self.dataExtractor.extractData(column)
+        title = 'Finish' if len(self.columnsToPlot) - 1 == self.currentPlotIndex else 'Next'
+        saved, forced = self.plotDataWriter.getColumnStatus(column)
+        self.dataPlot.initializePlot(column, xData, yData, saved, forced, doneButtonTitle=title, analysis=analysis)
+
+    # ends the wait of run() for the current column
+    def navigate(self, navigation):
+        self.navigation = navigation
+        self.dataPlot.stopWaiting()
+
+    def done(self, column, forced, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevWidth):
+        if self.imageWriter != None:
+            with Timing.timer.measure('queue_image'):
+                self.imageWriter.addImage(self.dataPlot, titleColor=self.dataPlot.titleColor)
         self.plotDataWriter.addLine(column, forced, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevWidth)
-        self.currentPlotIndex += 1
-        self.plotNext()
+        self.navigate('next')
 
     def skip(self):
+        self.navigate('next')
+
+    def advance(self):
         self.currentPlotIndex += 1
-        self.plotNext()
+        while self.currentPlotIndex < len(self.columnsToPlot) and self.columnsToPlot[self.currentPlotIndex] in self.completedColumns:
+            self.currentPlotIndex += 1
 
     def prev(self):
         if self.currentPlotIndex > 0:
-            self.currentPlotIndex -= 1
-            self.plotNext()
+            self.navigate('prev')
 
     def dump(self):
-        self.plotDataWriter.writeToFile(self.outputDirectory)
+        self.writeData()
 
     def exit(self):
+        self.navigate('exit')
+
+    def writeData(self):
         self.plotDataWriter.writeToFile(self.outputDirectory)
+        if self.sqliteDataWriter != None:
+            self.sqliteDataWriter.writePlotData(self.filename, self.outputDirectory, self.plotDataWriter, background=self.background)
+
+    def finish(self):
+        self.writeData()
+        self.plotDataWriter.close()
+        if self.sqliteDataWriter != None:
+            self.sqliteDataWriter.close()
+        if self.recorder != None:
+            self.recorder.close()
+        if self.prefetcher != None:
+            self.prefetcher.close()
+        # images that are still queued are written before exiting
+        if self.imageWriter != None:
+            self.imageWriter.close()
+        Timing.timer.writeReport(self.outputDirectory)
+        self.printStatistics()
         sys.exit()
+
+    def printStatistics(self):
+        stats = self.dataPlot.peakCache.stats()
+        print("Peak detection cache: " + str(stats['hits']) + " hits, " + str(stats['misses']) + " misses.")
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+import PeakAnalyzer
+import Timing
+
+# Loads and analyzes the columns around the one that is being edited on a
+# worker thread so that moving to them only has to draw the results. The
+# worker has its own analyzer so it never touches the one behind the plot.
+# Columns in skipColumns are passed over when looking ahead, the same way Next
+# passes over them.
+class ColumnPrefetcher:
+    def __init__(self, dataExtractor, columns, background, lookAhead=1, lookBehind=0, prominenceMode='single', skipColumns=()):
+        self.dataExtractor = dataExtractor
+        self.columns = columns
+        self.skipColumns = skipColumns
+        self.lookAhead = lookAhead
+        self.lookBehind = lookBehind
+        self.analyzer = PeakAnalyzer.PeakAnalyzer(background, prominenceMode=prominenceMode)
+        # a single thread so the analyzer is only ever used by one column at a time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # column index -> future of the analysis
+        self.futures = {}
+
+    # starts on the columns around index, anything further away is dropped
+    def prefetch(self, index):
+        wanted = [i for i in range(index + 1, len(self.columns)) if self.columns[i] not in self.skipColumns][:self.lookAhead]
+        wanted.extend(range(index - 1, index - self.lookBehind - 1, -1))
+        wanted = [i for i in wanted if i >= 0 and i < len(self.columns)]
+
+        for i in list(self.futures):
+            if i not in wanted:
+                self.futures.pop(i).cancel()
+
+        for i in wanted:
+            if i not in self.futures:
+                self.futures[i] = self.executor.submit(self.analyze, self.columns[i])
+
+    # returns the analysis of the column at index, waiting for it if it is still
+    # running, or None if it was never started
+    def get(self, index):
+        future = self.futures.pop(index, None)
+        if future == None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print("Could not prefetch " + self.columns[index] + "!")
+            print(e)
+            return None
+
+    def analyze(self, column):
+        with Timing.timer.measure('prefetch_analysis', column=column):
+            xData, yData = self.dataExtractor.extractData(column)
+            if not self.analyzer.setData(column, xData, yData):
+                return None
+            self.analyzer.analyze()
+            return self.analyzer.getAnalysis()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+CACHE_VERSION = 1
+
+# Stores parsed recordings as .npy files that can be memory mapped on the next
+# open. A json file next to the array records the source path, size and mtime
+# and the cache is only used while all of them still match.
+class DataCache:
+    def __init__(self, cacheDirectory=None):
+        self.cacheDirectory = cacheDirectory
+
+    # single and double precision caches of the same file are kept side by side
+    def cachePaths(self, filename, dtype):
+        if self.cacheDirectory == None:
+            base = filename + '.cache'
+        else:
+            digest = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:12]
+            base = os.path.join(self.cacheDirectory, os.path.basename(filename) + '_' + digest)
+        base += '.' + np.dtype(dtype).name
+        return (base + '.npy', base + '.json')
+
+    def cacheKey(self, filename, dtype):
+        stat = os.stat(filename)
+        return {
+            'version': CACHE_VERSION,
+            'path': os.path.abspath(filename),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'dtype': np.dtype(dtype).str
+        }
+
+    # returns (timeField, availableColumnNames, columnIndex, data) or None if
+    # there is no valid cache for the file
+    def load(self, filename, dtype):
+        arrayPath, metaPath = self.cachePaths(filename, dtype)
+        try:
+            with open(metaPath) as metaFile:
+                meta = json.load(metaFile)
+            if meta['key'] != self.cacheKey(filename, dtype):
+                return None
+            data = np.load(arrayPath, mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+        return (meta['timeField'], meta['availableColumnNames'], meta['columnIndex'], data)
+
+    # key must be taken before the file is parsed so a file that changes while
+    # it is being read is never cached as the new version
+    def store(self, key, filename, timeField, availableColumnNames, columnIndex, data):
+        arrayPath, metaPath = self.cachePaths(filename, data.dtype)
+        meta = {
+            'key': key,
+            'timeField': timeField,
+            'availableColumnNames': availableColumnNames,
+            'columnIndex': columnIndex
+        }
+        try:
+            if self.cacheDirectory != None:
+                os.makedirs(self.cacheDirectory, exist_ok=True)
+            # several processes may be writing the same cache at once so each
+            # one writes to its own temporary file
+            suffix = '.' + str(os.getpid()) + '.tmp'
+            # the array is written first since the metadata marks the cache as valid
+            with open(arrayPath + suffix, mode='wb') as arrayFile:
+                np.save(arrayFile, data)
+            os.replace(arrayPath + suffix, arrayPath)
+            with open(metaPath + suffix, mode='w') as metaFile:
+                json.dump(meta, metaFile)
+            os.replace(metaPath + suffix, metaPath)
+        except Exception as e:
+            print("WARNING: Could not write the data cache for ", filename)
+            print(e)
@@ -1,17 +1,32 @@
 import csv
+import Timing
 import numpy as np
 
+# number of csv rows converted to floats at a time while parsing
+PARSE_BLOCK_ROWS = 4096
+
+def getDataFieldNames(fieldnames):
+    dataFieldNames = []
+    for fieldname in fieldnames:
+        if fieldname != '' and not fieldname.lower().startswith('time'):
+            dataFieldNames.append(fieldname)
+    return dataFieldNames
+
+# reads only the header of the file, returns the same column names as
+# availableColumnNames would
+def readAvailableColumns(filename):
+    with open(filename, newline='') as csvfile:
+        return getDataFieldNames(next(csv.reader(csvfile)))
+
 class DataExtractor:
-    def __init__(self, filename):
-        self.timeField, self.availableColumnNames, self.data = self.openFile(filename)
+    def __init__(self, filename, dtype=np.float64, cache=None):
+        self.dtype = np.dtype(dtype)
+        self.cache = cache
+        self.timeField, self.availableColumnNames, self.columnIndex, self.data = self.openFile(filename)
 
+    # returns views of the parsed columns, nothing is copied
     def extractData(self, yFieldname):
-        xData = []
-        yData = []
-        for row in self.data:
-            xData.append(float(row[self.timeField]))
-            yData.append(float(row[yFieldname]))
-        return (np.array(xData), np.array(yData))
+        return (self.data[self.columnIndex[self.timeField]], self.data[self.columnIndex[yFieldname]])
 
     def getAvailableColumns(self, mode):
         if mode == 'background':
@@ -20,18 +35,57 @@ class DataExtractor:
             return list(filter(lambda val: not val.endswith('B'), self.availableColumnNames))
 
     def openFile(self, filename):
+        if self.cache != None:
+            with Timing.timer.measure('cache_load', column=''):
+                cached = self.cache.load(filename, self.dtype)
+            if cached != None:
+                return cached
         try:
-            with open(filename) as csvfile:
-                reader = csv.DictReader(csvfile)
+            if self.cache != None:
+                cacheKey = self.cache.cacheKey(filename, self.dtype)
+            with open(filename, newline='') as csvfile:
+                reader = csv.reader(csvfile)
                 # First we need to determine the columns that are available
                 # and we can assume that the first column is the time series
-                fieldnames = list(reader.fieldnames)
-                dataFieldNames = []
-
-                for fieldname in fieldnames:
-                    if fieldname != '' and not fieldname.lower().startswith('time'):
-                        dataFieldNames.append(fieldname)
-                rows = list(reader)
-                return (fieldnames[0], dataFieldNames, rows)
+                fieldnames = next(reader)
+                dataFieldNames = getDataFieldNames(fieldnames)
+
+                # only the time series and the data columns are kept, the time
+                # series is always the first row of the parsed array
+                keptFieldNames = [fieldnames[0]]
+                keptFieldNames.extend(x for x in dict.fromkeys(dataFieldNames) if x != fieldnames[0])
+                sourceIndex = {fieldname: i for i, fieldname in enumerate(fieldnames)}
+                indices = [sourceIndex[fieldname] for fieldname in keptFieldNames]
+                columnIndex = {fieldname: i for i, fieldname in enumerate(keptFieldNames)}
+
+                with Timing.timer.measure('parse', column=''):
+                    data = self.parseRows(reader, indices)
+            if self.cache != None:
+                self.cache.store(cacheKey, filename, fieldnames[0], dataFieldNames, columnIndex, data)
+            return (fieldnames[0], dataFieldNames, columnIndex, data)
         except:
-            print("ERROR: There was an error opening ", filename)
\ No newline at end of file
+            print("ERROR: There was an error opening ", filename)
+
+    # converts the csv rows into a (columns, rows) array so that every column
+    # is a contiguous block of memory
+    def parseRows(self, reader, indices):
+        width = max(indices) + 1
+        blocks = []
+        block = []
+        for row in reader:
+            # DictReader used to skip blank lines so we do too
+            if len(row) == 0:
+                continue
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            block.append([row[i] if row[i] != '' else 'nan' for i in indices])
+            if len(block) == PARSE_BLOCK_ROWS:
+                blocks.append(np.array(block, dtype=self.dtype))
+                block = []
+        if len(block) > 0 or len(blocks) == 0:
+            blocks.append(np.array(block, dtype=self.dtype).reshape(-1, len(indices)))
+
+        data = np.ascontiguousarray(np.concatenate(blocks).T)
+        # the extracted columns are views so they must never be modified
+        data.flags.writeable = False
+        return data
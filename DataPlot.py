@@ -1,18 +1,22 @@
 import matplotlib.pyplot as plt
-from scipy.signal import find_peaks
+from matplotlib.backend_bases import TimerBase
+import PeakAnalyzer
+import PeakSet
+import PlotRenderer
+import Timing
 import math
 import csv
 import numpy as np
 import time
 
-colorSets = ['blue', 'orange', 'purple', 'magenta', 'brown', 'gold', 'lightskyblue', 'gray', 'blueviolet', 'olive']
+# milliseconds between redraws while a slider is being dragged
+REDRAW_INTERVAL = 40
 
-class DataPlot:
+class DataPlot(PeakAnalyzer.PeakAnalyzer):
 
-    def __init__(self, doneCallback, skipCallback, dumpCallback, exitCallback, prevCallback, background, MAX_PROMINENCE=6.0, FALSE_MAXIMUM_ROW_DISTANCE = 30):
+    def __init__(self, doneCallback, skipCallback, dumpCallback, exitCallback, prevCallback, background, MAX_PROMINENCE=6.0, FALSE_MAXIMUM_ROW_DISTANCE = 30, prominenceMode='single'):
 
-        self.MAX_PROMINENCE = MAX_PROMINENCE
-        self.FALSE_MAXIMUM_ROW_DISTANCE = FALSE_MAXIMUM_ROW_DISTANCE
+        PeakAnalyzer.PeakAnalyzer.__init__(self, background, MAX_PROMINENCE, FALSE_MAXIMUM_ROW_DISTANCE, prominenceMode)
 
         self.doneCallback = doneCallback
         self.skipCallback = skipCallback
@@ -20,11 +24,12 @@ class DataPlot:
         self.exitCallback = exitCallback
         self.prevCallback = prevCallback
 
+        # an InteractionRecorder that the operator's actions are written to
+        self.recorder = None
+
         self.fig = plt.figure()
         self.ax = self.fig.add_subplot(111)
 
-        self.background = background
-
         self.ax.set_xlabel("Time")
         self.ax.set_ylabel("Voltage")
 
@@ -42,6 +47,10 @@ class DataPlot:
         max_prom_slider_ax = self.fig.add_axes([0.25, 0.12, 0.65, 0.03])
         self.max_prom_slider = plt.Slider(max_prom_slider_ax, 'Max. Prom.', 0.0, MAX_PROMINENCE, valinit=MAX_PROMINENCE)
 
+        # the sliders are drawn along with the rest of the plot when it is blitted
+        self.min_prom_slider.drawon = False
+        self.max_prom_slider.drawon = False
+
         self.min_prom_slider.on_changed(self.updateProminence)
         self.max_prom_slider.on_changed(self.updateProminence)
 
@@ -76,47 +85,49 @@ class DataPlot:
         self.exitButton.on_clicked(self.exit)
 
         self.fig.canvas.mpl_connect('button_press_event', self.onclick)
-
-
-    def initializePlot(self, column, xData, yData, saved, forced, doneButtonTitle='Done'):
-
-        self.yData = yData
-        self.xData = xData
-
-        self.minimums = np.array([], dtype=np.int_)
-        self.maximums = np.array([], dtype=np.int_)
-
-        self.column = column
-
-        parts = column.lower().split("_")
-        if len(parts) != 3:
-            # should error here
+        # closing the window stops waiting like the buttons do
+        self.fig.canvas.mpl_connect('close_event', self.stopWaiting)
+
+        # The trace only changes when a new column is shown so it is part of the
+        # saved background. The candidate peaks and the annotations are animated
+        # artists that are redrawn on top of that background after every edit.
+        self.traceLine, = self.ax.plot([], [])
+        self.maxCandidateLine, = self.ax.plot([], [], "o", alpha=0.7, color='darkgreen', animated=True)
+        self.minCandidateLine, = self.ax.plot([], [], "o", alpha=0.7, color='darkred', animated=True)
+        self.annotations = []
+        self.blitBackground = None
+        self.fig.canvas.mpl_connect('draw_event', self.onDraw)
+
+        # only a decimated copy of the trace is drawn, it is rebuilt for the
+        # visible range whenever the plot is zoomed, panned or resized
+        self.ax.callbacks.connect('xlim_changed', self.updateTrace)
+        self.fig.canvas.mpl_connect('resize_event', self.updateTrace)
+
+        # slider changes only mark the plot as out of date, the timer redraws it
+        # with whatever the latest values are. Non interactive backends have
+        # timers that never fire so they are redrawn straight away.
+        self.redrawPending = False
+        self.redrawTimer = self.fig.canvas.new_timer(interval=REDRAW_INTERVAL)
+        self.redrawTimer.single_shot = True
+        self.redrawTimer.add_callback(self.onRedrawTimer)
+        self.throttleRedraws = type(self.redrawTimer) is not TimerBase
+
+    # analysis is a precomputed result of getAnalysis() for this column, when it
+    # is missing the column is analyzed here
+    def initializePlot(self, column, xData, yData, saved, forced, doneButtonTitle='Done', analysis=None):
+
+        self.record('column', column=column)
+
+        if not self.setData(column, xData, yData):
             return
 
-        color, intensity, fps = parts
-
-        if color == 'b':
-            self.color = 'Blue'
-        elif color == 'uv':
-            self.color = 'Ultra Violet'
-        elif color == 'bw':
-            self.color = 'White'
-
-        self.intensity = int(intensity)
-
-
-        self.fps = int(fps[:-1] if self.background else fps)
-
-        self.min_prominence = 0
-        self.max_prominence = 0
-
         self.doneButtonTitle = doneButtonTitle
         self.doneButton.label.set_text(doneButtonTitle)
 
-        self.determineMaxProminence()
-        self.determineMinProminence()
-
-        self.attemptAutomaticDataInterpretation()
+        if analysis != None:
+            self.applyAnalysis(analysis)
+        else:
+            self.analyze()
 
         if forced:
             self.titleColor = 'red'
@@ -125,317 +136,208 @@ class DataPlot:
         else:
             self.titleColor = 'black'
 
-        self.plotData()
-
-        plt.show() # I don't know why but this has to be here
-
-    # This function assumes well formatted minimums and maximums
-    def getMaximumMinimumPairs(self):
-        minimums, maximums = self.getOrderedMaximumAndMinimum(self.minimums, self.maximums)
-        results = []
-        dataLength = max(len(maximums), len(minimums))
-        for i in range(0, dataLength):
-            if i < len(minimums):
-                _min = minimums[i]
-                minX = self.xData[_min]
-                minY = self.yData[_min]
-            else:
-                minX = '-'
-                minY = '-'
-
-            if i < len(maximums):
-                _max = maximums[i]
-                maxX = self.xData[_max]
-                maxY = self.yData[_max]
-            else:
-                maxX = '-'
-                maxY = '-'
-            results.append(((minX, minY), (maxX, maxY)))
-        return results
-
-    def minMaxAreOffset(self, minimums, maximums):
-        return sorted(minimums)[0] > sorted(maximums)[0]
-
-    # This function assumes well formatted minimums and maximums of the same length
-    def determineAveragePeakHeightWidth(self):
-
-        minimums, maximums = self.getOrderedMaximumAndMinimum(self.minimums, self.maximums)
-
-        dataLength = len(self.minimums)
-
-        widths = []
-        heights = []
-
-        for i in range(0, dataLength):
-            min = minimums[i]
-            max = maximums[i]
-            minX = self.xData[min]
-            minY = self.yData[min]
-            maxX = self.xData[max]
-            maxY = self.yData[max]
-
-            # we discard offset data
-            if i != 0 or not self.minMaxAreOffset(self.minimums, self.maximums):
-                widths.append(maxX - minX)
-
-            heights.append(maxY - minY)
-
-        # this is wrong, average width might not be correct
-        averageHeight = np.mean(heights)
-        averageWidth = np.mean(widths)
-        heightStdDev = np.std(heights)
-        widthStdDev = np.std(widths)
-
-        # We can't calculate the offset for a single value
-        if self.minMaxAreOffset(self.minimums, self.maximums) and dataLength == 1:
-            averageWidth = 'N/A'
-
-        return (averageHeight, averageWidth, heightStdDev, widthStdDev)
-
-    def validateMinMax(self, verbose=False):
-
-        minimums, maximums = self.getOrderedMaximumAndMinimum(self.minimums, self.maximums)
-
-        minLength = min(len(maximums), len(minimums))
-
-        if len(minimums) == 0 or len(maximums) == 0:
-            if verbose:
-                print("ERROR: Minimums or maximums array length is zero.")
-            return (False, -1, 'zero_length')
-
-        # check that the data is in proper order
-        offset = self.minMaxAreOffset(minimums, maximums)
-        if (offset and minimums[0] < maximums[0]) or (not offset and minimums[0] > maximums[0]):
-            if verbose:
-                print("ERROR: minimums/maximums not in proper order")
-            return (False, 0, 'improper_order')
-
-        interwoven = []
-        # first interweave the min/max pairs
-        for i in range(1, minLength):
-            interwoven.append(minimums[i])
-            interwoven.append(maximums[i])
-
-        for i in range(0, len(interwoven) - 1):
-            val1 = interwoven[i]
-            val2 = interwoven[i + 1]
-            if val1 > val2:
-                if verbose:
-                    print("ERROR: minimums/maximums not in proper order")
-                return (False, int(i / 2) + 1, 'improper_order')
-
-        if len(minimums) != len(maximums):
-            if verbose:
-                print("ERROR: Different number of minimums (" + str(len(minimums)) + ") than maximums (" + str(len(maximums)) + ")!")
-            return (False, minLength, 'len_min_max_different')
-
-        reqPeaks = self.requiredPeaks()
-        if reqPeaks != len(minimums) or reqPeaks != len(maximums):
-            if verbose:
-                print("ERROR: Expected " + str(reqPeaks) + " peaks but have " + str(len(minimums)) + ".")
-            return (False, -1, 'wrong_peak_count')
-
-        return (True, -1, None)
+        self.plotData(full=True)
+
+    # runs the event loop of the plot until stopWaiting is called, the caller
+    # then decides what to show next
+    def waitForAction(self):
+        self.fig.canvas.start_event_loop(timeout=0)
+
+    def stopWaiting(self, event=None):
+        self.fig.canvas.stop_event_loop()
+
+    # drops everything that belongs to the column that was shown so only one
+    # column's data is ever held on to
+    def releaseColumn(self):
+        self.redrawTimer.stop()
+        self.redrawPending = False
+        empty = np.array([])
+        self.xData = empty
+        self.yData = empty
+        self.peaks = PeakSet.PeakSet(empty, empty)
+        self.peakCache.clear()
+        for line in [self.traceLine, self.maxCandidateLine, self.minCandidateLine]:
+            line.set_data([], [])
+        for annotation in self.annotations:
+            annotation.remove()
+        self.annotations = []
+        self.blitBackground = None
+
+    def record(self, kind, **arguments):
+        if self.recorder != None:
+            self.recorder.record(kind, **arguments)
 
     def reset(self, val):
-        self.determineMaxProminence()
-        self.determineMinProminence()
-        self.attemptAutomaticDataInterpretation()
+        self.record('button', button='reset', key=val.key)
+        self.analyze()
         self.plotData()
 
     def skip(self, val):
+        self.record('button', button='skip', key=val.key)
         self.skipCallback()
 
     def exit(self, val):
+        self.record('button', button='exit', key=val.key)
         self.exitCallback()
 
     def dump(self, val):
+        self.record('button', button='dump', key=val.key)
         self.dumpCallback()
 
     def prev(self, val):
+        self.record('button', button='prev', key=val.key)
         self.prevCallback()
 
     def clear(self, val):
-        self.minimums = np.array([], dtype=np.int_)
-        self.maximums = np.array([], dtype=np.int_)
+        self.record('button', button='clear', key=val.key)
+        self.peaks.clear()
         self.plotData()
 
     # holding f key while clicking done overrides validation for better or for worse
     def done(self, event):
+        self.record('button', button='done', key=event.key)
         valid, _, error = self.validateMinMax(verbose=event.key != 't')
         if event.key == 't' and not valid:
             print("Forcing output!")
         if not valid and event.key != 't':
             print("Hold t key while pressing " + self.doneButtonTitle + " to force data output (not recommended).")
             return
-        # We can't calculate the average height and average duration if it's forced
-        if valid or error == 'wrong_peak_count':
-            averageHeight, averageDuration, stdDevHeight, stdDevDuration = self.determineAveragePeakHeightWidth()
-        else:
-            averageHeight = averageDuration = 'N/A'
-        minMaxPairs = self.getMaximumMinimumPairs()
-        self.doneCallback(self.column, not valid and event.key == 't', minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration, plt)
-
-    def title(self):
-        return self.color + ", Intensity " + str(self.intensity) + " @ " + str(self.fps) + " fps (" + self.column + ") Expecting " + str(self.requiredPeaks()) + " pairs"
+        minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration = self.getResults()
+        self.doneCallback(self.column, not valid and event.key == 't', minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration)
 
     def determineMaxProminence(self):
-        maxAndMin = self.requiredPeaks()
-        self.max_prominence = self.MAX_PROMINENCE
-
-        while self.max_prominence > 0.0:
-            self.max_prominence -= .1
-            max_peaks = self.findMaxPeaks()
-            if len(max_peaks) >= maxAndMin:
-                break
-
-        time.sleep(.2)
+        with Timing.timer.measure('max_prominence'):
+            PeakAnalyzer.PeakAnalyzer.determineMaxProminence(self)
+        if self.prominenceMode == 'sweep':
+            time.sleep(.2)
         self.max_prom_slider.set_val(self.max_prominence)
 
     def determineMinProminence(self):
-        # determine how many peaks we are looking for
-        maxAndMin = self.requiredPeaks()
-        self.min_prominence = self.MAX_PROMINENCE
-
-        while self.min_prominence > 0.0:
-            self.min_prominence -= .1
-            if len(self.findMinPeaks()) >= maxAndMin:
-                break
-
-        time.sleep(.2)
+        with Timing.timer.measure('min_prominence'):
+            PeakAnalyzer.PeakAnalyzer.determineMinProminence(self)
+        if self.prominenceMode == 'sweep':
+            time.sleep(.2)
         self.min_prom_slider.set_val(self.min_prominence)
 
-    def requiredPeaks(self):
-        return math.ceil(self.fps / 5.0)
+    def attemptAutomaticDataInterpretation(self):
+        with Timing.timer.measure('interpretation'):
+            PeakAnalyzer.PeakAnalyzer.attemptAutomaticDataInterpretation(self)
+
+    def applyAnalysis(self, analysis):
+        PeakAnalyzer.PeakAnalyzer.applyAnalysis(self, analysis)
+        # moving a slider reads both of them back so the analysis values are used
+        self.max_prom_slider.set_val(analysis['max_prominence'])
+        self.min_prom_slider.set_val(analysis['min_prominence'])
 
     def updateProminence(self, val):
+        # only the operator drags a slider, the analysis sets them directly
+        for name, slider in [('min', self.min_prom_slider), ('max', self.max_prom_slider)]:
+            if slider.drag_active:
+                self.record('slider', slider=name, value=float(val))
         self.min_prominence = self.min_prom_slider.val
         self.max_prominence = self.max_prom_slider.val
+        if not self.throttleRedraws:
+            self.plotData()
+        elif not self.redrawPending:
+            self.redrawPending = True
+            self.redrawTimer.start()
+
+    def onRedrawTimer(self):
+        self.redrawPending = False
         self.plotData()
 
-    def filterClosePeaks(self, peaks):
-        # if there are two peaks of equal height right next to each other
-        # we want to filter that out...
-        result = []
-        for idx, val in enumerate(peaks):
-            if idx == len(peaks) - 1 or \
-                    abs(peaks[idx] - peaks[idx + 1]) > self.FALSE_MAXIMUM_ROW_DISTANCE or \
-                    self.yData[peaks[idx]] != self.yData[peaks[idx + 1]]:
-                result.append(val)
-        return np.array(result)
-
-    def findMaxPeaks(self):
-        maxima, _ = find_peaks(self.yData, prominence=self.max_prominence)
-        return self.filterClosePeaks(maxima)
-
-    def findMinPeaks(self):
-        minima, _ = find_peaks(-self.yData, prominence=self.min_prominence)
-        return self.filterClosePeaks(minima)
-
-    def findPeaks(self):
-        return (self.findMaxPeaks(), self.findMinPeaks())
-
-    def attemptAutomaticDataInterpretation(self):
-        minPeaks = list(self.findMinPeaks())
-        maxPeaks = list(self.findMaxPeaks())
-
-        offset = self.minMaxAreOffset(minPeaks, maxPeaks)
-
-        # this code does some fancy tricks to find places where
-        # two or more max peaks or two or more min peaks sit between two max/min peaks respectively
-        for i in range(0, len(minPeaks) - 1):
-            peak1 = minPeaks[i]
-            peak2 = minPeaks[i+1]
-            midPeaks = [(self.yData[x], i) for i, x in enumerate(maxPeaks) if x > peak1 and x < peak2]
-            if len(midPeaks) > 1:
-                # find the max value of the mid peaks
-                maxValue = max(midPeaks, key=lambda item: item[0])
-                midPeaks.remove(maxValue)
-                valuesToRemove = list(map(lambda val: maxPeaks[val[1]], midPeaks))
-                for val in valuesToRemove:
-                    maxPeaks.remove(val)
-
-        for i in range(0, len(maxPeaks) - 1):
-            peak1 = maxPeaks[i]
-            peak2 = maxPeaks[i+1]
-            midPeaks = [(self.yData[x], i) for i, x in enumerate(minPeaks) if x > peak1 and x < peak2]
-            if len(midPeaks) > 1:
-                # find the max value of the mid peaks
-                minValue = min(midPeaks, key=lambda item: item[0])
-                midPeaks.remove(minValue)
-                valuesToRemove = list(map(lambda val: minPeaks[val[1]], midPeaks))
-                for val in valuesToRemove:
-                    minPeaks.remove(val)
-
-        # make smarter b_1_75
-
-        self.minimums = np.array(minPeaks)
-        self.maximums = np.array(maxPeaks)
-
-    def plotData(self):
-        maxima, minima = self.findPeaks()
-
-        validated, idx, error = self.validateMinMax()
-
-        if validated:
-            self.doneButton.color = 'green'
-            self.doneButton.hovercolor = 'darkgreen'
-        elif error == 'wrong_peak_count':
-            self.doneButton.color = 'yellow'
-            self.doneButton.hovercolor = 'gold'
-        else:
-            self.doneButton.color = 'red'
-            self.doneButton.hovercolor = 'darkred'
-
-        self.ax.clear()
-        self.ax.plot(self.xData, self.yData)
-
-        if len(maxima) > 0:
-            self.ax.plot(self.xData[maxima], self.yData[maxima], "o", alpha=0.7, color='darkgreen')
-        if len(minima) > 0:
-            self.ax.plot(self.xData[minima], self.yData[minima], "o", alpha=0.7, color='darkred')
-
-        minimums, maximiums = self.getOrderedMaximumAndMinimum(self.minimums, self.maximums)
+    # full redraws are only needed when a new column is shown, everything else
+    # just updates the animated artists
+    def plotData(self, full=False):
+        with Timing.timer.measure('plot' if full else 'redraw'):
+            maxima, minima = self.findPeaks()
 
-        valid, brokenIdx, _ = self.validateMinMax()
+            validated, brokenIdx, error = self.validateMinMax()
 
-        for idx, val in enumerate(minimums):
-            error = not valid and brokenIdx == idx
-            color = 'red' if error else colorSets[idx % len(colorSets)]
-            style = 'italic' if error else 'normal'
-            self.ax.annotate(str(idx + 1) + " min", (self.xData[val], self.yData[val]), textcoords='offset pixels', xytext=(15, -15), fontweight='bold', style=style,
-                    fontsize=8, color=color, arrowprops={'arrowstyle': '->'})
-
-        for idx, val in enumerate(maximiums):
-            error = not valid and brokenIdx == idx
-            color = 'red' if error else colorSets[idx % len(colorSets)]
-            style = 'italic' if error else 'normal'
-            self.ax.annotate(str(idx + 1) + " max", (self.xData[val], self.yData[val]), textcoords='offset pixels',
-                             xytext=(15, 15), fontweight='bold', style=style,
-                             fontsize=8, color=color, arrowprops={'arrowstyle': '->'})
-
-
-        self.ax.set_title(self.title(), color=self.titleColor)
-
-        plt.show(block=False)
-        plt.draw()
-        # self.fig.canvas.flush_events()
-
-    # orders the minimums and maximums taking account for any offsets that may be in place
-    def getOrderedMaximumAndMinimum(self, mins, maxs):
-
-        maximums = sorted(maxs)
-        minimums = sorted(mins)
-
-        if len(maximums) == 0 or len(minimums) == 0:
-            return (minimums, maximums)
+            if validated:
+                self.doneButton.color = 'green'
+                self.doneButton.hovercolor = 'darkgreen'
+            elif error == 'wrong_peak_count':
+                self.doneButton.color = 'yellow'
+                self.doneButton.hovercolor = 'gold'
+            else:
+                self.doneButton.color = 'red'
+                self.doneButton.hovercolor = 'darkred'
+            self.doneButton.ax.set_facecolor(self.doneButton.color)
+
+            self.maxCandidateLine.set_data(self.xData[maxima] if len(maxima) > 0 else [], self.yData[maxima] if len(maxima) > 0 else [])
+            self.minCandidateLine.set_data(self.xData[minima] if len(minima) > 0 else [], self.yData[minima] if len(minima) > 0 else [])
+
+            minimums, maximums = self.peaks.ordered()
+            self.updateAnnotations(minimums, maximums, validated, brokenIdx)
+
+            if full:
+                # the whole trace has the same extent as its decimated copy
+                self.traceLine.set_data(self.xData, self.yData)
+                # zooming turns autoscaling off, a new column starts unzoomed
+                self.ax.set_autoscale_on(True)
+                self.ax.relim()
+                self.ax.autoscale_view()
+                self.updateTrace()
+                self.ax.set_title(self.title(), color=self.titleColor)
+                # the saved background still shows the last column
+                self.blitBackground = None
+                plt.show(block=False)
+                self.fig.canvas.draw_idle()
+            else:
+                self.blit()
 
-        if self.minMaxAreOffset(minimums, maximums):
-            minArray = [minimums[-1]]
-            minArray.extend(minimums[:-1])
-            return (minArray, maximums)
-        else:
-            return (minimums, maximums)
+    def updateTrace(self, event=None):
+        if len(self.xData) == 0:
+            return
+        xMin, xMax = sorted(self.ax.get_xlim())
+        visible = PlotRenderer.decimate(self.xData, self.yData, xMin, xMax, self.ax.bbox.width)
+        self.traceLine.set_data(self.xData[visible], self.yData[visible])
+
+    def updateAnnotations(self, minimums, maximums, valid, brokenIdx):
+        labels = [(idx, val, " min", (15, -15)) for idx, val in enumerate(minimums)]
+        labels.extend((idx, val, " max", (15, 15)) for idx, val in enumerate(maximums))
+
+        while len(self.annotations) < len(labels):
+            self.annotations.append(self.ax.annotate('', (0, 0), textcoords='offset pixels', xytext=(15, 15), fontweight='bold',
+                    fontsize=8, arrowprops={'arrowstyle': '->'}, animated=True))
+
+        for annotation, (idx, val, kind, offset) in zip(self.annotations, labels):
+            color, style = PlotRenderer.annotationStyle(idx, valid, brokenIdx)
+            annotation.set_text(str(idx + 1) + kind)
+            annotation.xy = (self.xData[val], self.yData[val])
+            annotation.xyann = offset
+            annotation.set_color(color)
+            annotation.set_style(style)
+            annotation.set_visible(True)
+
+        for annotation in self.annotations[len(labels):]:
+            annotation.set_visible(False)
+
+    def animatedArtists(self):
+        return [self.maxCandidateLine, self.minCandidateLine] + self.annotations
+
+    # the background is saved after every full draw, which also happens when
+    # zooming, panning or resizing
+    def onDraw(self, event):
+        if self.fig.canvas.is_saving():
+            return
+        self.blitBackground = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.animatedArtists():
+            self.ax.draw_artist(artist)
+
+    def blit(self):
+        canvas = self.fig.canvas
+        if self.blitBackground == None or not canvas.supports_blit:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.blitBackground)
+        for artist in self.animatedArtists():
+            self.ax.draw_artist(artist)
+        # the sliders and the done button change along with the peaks
+        for widgetAxes in [self.min_prom_slider.ax, self.max_prom_slider.ax, self.doneButton.ax]:
+            self.fig.draw_artist(widgetAxes)
+        canvas.blit(self.fig.bbox)
 
     def addSpecificMinMax(self, clickX, minOrMax):
         dataMaxX = self.xData[-1]
@@ -451,27 +353,20 @@ class DataPlot:
         elif clickX > dataMaxX:
             action(len(self.xData) - 1, 'insert')
         else:
-            for i in range(0, len(self.xData)):
-                val = self.xData[i]
-                if clickX < val:
-                    action(i, 'insert')
-                    break
+            # the time series is sorted so the first sample after the click
+            # can be found with a binary search
+            i = np.searchsorted(self.xData, clickX, side='right')
+            if i < len(self.xData):
+                action(int(i), 'insert')
 
     def addRemoveMinMax(self, clickX, clickY, action):
 
-        # we create sets here so we only get the unique values
-        minSet = set(self.findMinPeaks())
-        minSet.update(self.minimums)
-
-        maxSet = set(self.findMaxPeaks())
-        maxSet.update(self.maximums)
-
-        minPeakDistances = []
-        maxPeakDistances = []
-
-        minList = list(minSet)
-        maxList = list(maxSet)
+        # the candidates are the detected peaks and the ones already chosen
+        minCandidates = np.union1d(self.findMinPeaks(), self.peaks.minimums).astype(np.intp)
+        maxCandidates = np.union1d(self.findMaxPeaks(), self.peaks.maximums).astype(np.intp)
 
+        if len(minCandidates) == 0 and len(maxCandidates) == 0:
+            return
 
         # Since the x/y scales are different we get the aspect ratio to better
         # determine which point was closest to being clicked
@@ -480,47 +375,26 @@ class DataPlot:
 
         aspect = abs(yt - yb) / abs(xl - xr)
 
-        for val in minList:
-            peakX = self.xData[val]
-            peakY = self.yData[val]
-            distance = math.hypot(aspect * (clickX - peakX), clickY - peakY)
-            minPeakDistances.append(distance)
+        minPeakDistances = np.hypot(aspect * (clickX - self.xData[minCandidates]), clickY - self.yData[minCandidates])
+        maxPeakDistances = np.hypot(aspect * (clickX - self.xData[maxCandidates]), clickY - self.yData[maxCandidates])
 
-        for val in maxList:
-            peakX = self.xData[val]
-            peakY = self.yData[val]
-            distance = math.hypot(aspect * (clickX - peakX), clickY - peakY)
-            maxPeakDistances.append(distance)
-
-        closestMinPeak = min(minPeakDistances)
-        closestMaxPeak = min(maxPeakDistances)
+        closestMinPeak = minPeakDistances.min() if len(minCandidates) > 0 else math.inf
+        closestMaxPeak = maxPeakDistances.min() if len(maxCandidates) > 0 else math.inf
 
         if closestMinPeak < closestMaxPeak:
-            idx = minPeakDistances.index(closestMinPeak)
-            val = minList[idx]
-            self.insertRemoveMin(val, action)
+            self.insertRemoveMin(minCandidates[np.argmin(minPeakDistances)], action)
         else:
-            idx = maxPeakDistances.index(closestMaxPeak)
-            val = maxList[idx]
-            self.insertRemoveMax(val, action)
-
-    def insertRemoveMax(self, val, action):
-        if action == 'remove':
-            self.maximums = self.maximums[self.maximums != val]
-        elif action == 'insert' and not val in self.maximums:
-            self.maximums = np.append(self.maximums, int(val))
-
-    def insertRemoveMin(self, val, action):
-        if action == 'remove':
-            self.minimums = self.minimums[self.minimums != val]
-        elif action == 'insert' and not val in self.minimums:
-            self.minimums = np.append(self.minimums, int(val))
+            self.insertRemoveMax(maxCandidates[np.argmin(maxPeakDistances)], action)
 
     def onclick(self, event):
         # only do something if we are over the graph
         if event.inaxes == None or event.inaxes.name != 'main':
             return
 
+        if event.key in ['w', 'x', 'a', 'd']:
+            # the zoom decides which peak is closest to the click
+            self.record('click', key=event.key, x=float(event.xdata), y=float(event.ydata), xlim=[float(x) for x in self.ax.get_xlim()], ylim=[float(y) for y in self.ax.get_ylim()])
+
         if event.key == 'w':
             self.addSpecificMinMax(event.xdata, 'max')
         elif event.key == 'x':
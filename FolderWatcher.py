@@ -0,0 +1,141 @@
+import BatchProcessor
+import fnmatch
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+STATE_FILENAME = 'watch_state.json'
+
+# runs in a worker process, returns the output directory of the file
+def processFile(filename, outputDirectory, batchOptions):
+    BatchProcessor.BatchProcessor([filename], outputDirectory=outputDirectory, workers=1, **batchOptions)
+    return outputDirectory
+
+# Waits for recordings to appear in a directory and runs the batch pipeline on
+# each of them as soon as it is finished. A file counts as finished once its
+# size and modification time haven't changed for stableChecks polls in a row.
+# Every file gets its own output directory under outputDirectory. Finished
+# files are recorded in a state file there so that a restarted watcher only
+# picks up new or changed files. At most twice as many files as there are
+# workers are queued at once, the rest wait until the pool catches up.
+class FolderWatcher:
+    def __init__(self, directory, outputDirectory=None, pattern='*.csv', pollInterval=5.0, stableChecks=2, workers=1, batchOptions=None):
+        self.directory = directory
+        self.outputDirectory = outputDirectory if outputDirectory != None else os.path.join(directory, 'results')
+        self.pattern = pattern
+        self.pollInterval = pollInterval
+        self.stableChecks = stableChecks
+        self.workers = workers
+        self.batchOptions = batchOptions if batchOptions != None else {}
+
+        try:
+            os.makedirs(self.outputDirectory, exist_ok=True)
+        except Exception as e:
+            print("There was a problem creating the output directory.")
+            print(e)
+            sys.exit()
+
+        self.statePath = os.path.join(self.outputDirectory, STATE_FILENAME)
+        self.state = self.loadState()
+        # path -> (signature, number of polls it has been unchanged for)
+        self.candidates = {}
+        # future -> (path, signature)
+        self.running = {}
+
+    def loadState(self):
+        try:
+            with open(self.statePath) as stateFile:
+                return json.load(stateFile)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            print("ERROR: The watch state file " + self.statePath + " is damaged. Remove it to process every file again.")
+            sys.exit()
+
+    def saveState(self):
+        with open(self.statePath + '.tmp', mode='w') as stateFile:
+            json.dump(self.state, stateFile, indent=1)
+        os.replace(self.statePath + '.tmp', self.statePath)
+
+    # a file is processed again when its size or modification time changes
+    def signature(self, entry):
+        stat = entry.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def isDone(self, path, signature):
+        return path in self.state and self.state[path]['signature'] == signature
+
+    def run(self):
+        print("Watching " + self.directory + " for new recordings, results will be output to " + self.outputDirectory)
+        print("Press Ctrl+C to stop.")
+        # the workers share the terminal, so they ignore Ctrl+C and finish the
+        # file they are on while the watcher shuts down
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN)) as executor:
+            try:
+                while True:
+                    self.collectFinished()
+                    self.poll(executor)
+                    time.sleep(self.pollInterval)
+            except KeyboardInterrupt:
+                print("Stopping, waiting for " + str(len(self.running)) + " file(s) that are being processed.")
+                executor.shutdown(wait=True, cancel_futures=True)
+                self.collectFinished()
+
+    def poll(self, executor):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file() and fnmatch.fnmatch(entry.name, self.pattern)]
+        except OSError as e:
+            print("ERROR: Could not read " + self.directory)
+            print(e)
+            return
+
+        runningPaths = set(path for path, _ in self.running.values())
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            path = os.path.abspath(entry.path)
+            if path in runningPaths:
+                continue
+            try:
+                signature = self.signature(entry)
+            except OSError:
+                # the file was removed since the directory was listed
+                self.candidates.pop(path, None)
+                continue
+            if self.isDone(path, signature):
+                continue
+
+            lastSignature, unchanged = self.candidates.get(path, (None, 0))
+            unchanged = unchanged + 1 if signature == lastSignature else 0
+            self.candidates[path] = (signature, unchanged)
+
+            if unchanged >= self.stableChecks and len(self.running) < self.workers * 2:
+                del self.candidates[path]
+                self.submit(executor, path, signature)
+
+    def submit(self, executor, path, signature):
+        name = os.path.basename(path) + '_results_' + str(int(time.time()))
+        print("Processing " + path)
+        future = executor.submit(processFile, path, os.path.join(self.outputDirectory, name), self.batchOptions)
+        self.running[future] = (path, signature)
+
+    def collectFinished(self):
+        for future in [future for future in self.running if future.done()]:
+            path, signature = self.running.pop(future)
+            # files that were cancelled or interrupted are tried again next time
+            if future.cancelled():
+                continue
+            try:
+                output = future.result()
+                self.state[path] = {'signature': signature, 'output': output, 'error': None}
+            except (KeyboardInterrupt, BrokenProcessPool) as e:
+                print("Processing " + path + " was interrupted, it will be retried.")
+                continue
+            except BaseException as e:
+                # a broken file is not retried until it changes
+                print("ERROR: Could not process " + path)
+                print(e)
+                self.state[path] = {'signature': signature, 'output': None, 'error': str(e)}
+            self.saveState()
\ No newline at end of file
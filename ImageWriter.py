@@ -0,0 +1,52 @@
+import PlotRenderer
+import Timing
+import os
+import queue
+import threading
+
+# Saves column plots on a background thread so that moving on to the next
+# column never waits for an image to be encoded. Every column is drawn again
+# from its final peaks into its own Agg figure, the interactive figure is never
+# touched. The queue is bounded so a slow disk holds up the session instead of
+# piling up copies of the data.
+class ImageWriter:
+    def __init__(self, imageDirectory, format='png', dpi=None, maxQueued=8):
+        self.imageDirectory = imageDirectory
+        self.format = format
+        self.dpi = dpi
+        self.queue = queue.Queue(maxsize=maxQueued)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def imagePath(self, column):
+        return os.path.join(self.imageDirectory, column + '.' + self.format)
+
+    # edits replace the peak arrays instead of changing them, so the ones taken
+    # here stay as they are while the image is queued
+    def addImage(self, analyzer, titleColor='black'):
+        valid, brokenIdx, _ = analyzer.validateMinMax()
+        minimums, maximums = analyzer.peaks.ordered()
+        self.queue.put((analyzer.column, analyzer.xData, analyzer.yData, minimums, maximums, analyzer.title(), valid, brokenIdx, titleColor))
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job == None:
+                    return
+                self.saveImage(*job)
+            finally:
+                self.queue.task_done()
+
+    def saveImage(self, column, xData, yData, minimums, maximums, title, valid, brokenIdx, titleColor):
+        try:
+            with Timing.timer.measure('save_image', column=column):
+                PlotRenderer.renderColumn(self.imagePath(column), xData, yData, minimums, maximums, title, valid, brokenIdx,
+                                          titleColor=titleColor, format=self.format, dpi=self.dpi)
+        except Exception as e:
+            print("Could not save " + column + " plot!")
+            print(e)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
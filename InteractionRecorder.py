@@ -0,0 +1,38 @@
+import json
+import time
+
+# Writes every operator action of an interactive session to a file so it can
+# be replayed later by InteractionReplay. The file holds one json object per
+# line. The first line describes the session, every other line is an event
+# with its kind, the seconds since the session started and its arguments:
+#
+#   column  a column was shown                     column
+#   click   a/d/w/x click on the plot              key, x, y, xlim, ylim
+#   slider  a prominence slider was dragged        slider ('min' or 'max'), value
+#   button  one of the buttons was pressed         button, key
+#
+# Slider values set by the automatic interpretation aren't recorded, they
+# follow from the events before them. Every line is flushed as it is written
+# so a session that crashes is still recorded up to the crash.
+class InteractionRecorder:
+    def __init__(self, path, source, background=False, prominenceMode='single'):
+        self.path = path
+        self.start = time.perf_counter()
+        self.recordFile = open(path, mode='w')
+        self.write({'session': source, 'background': background, 'prominenceMode': prominenceMode, 'started': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def write(self, entry):
+        self.recordFile.write(json.dumps(entry) + '\n')
+        self.recordFile.flush()
+
+    def record(self, kind, **arguments):
+        if self.recordFile == None:
+            return
+        entry = {'event': kind, 't': round(time.perf_counter() - self.start, 4)}
+        entry.update(arguments)
+        self.write(entry)
+
+    def close(self):
+        if self.recordFile != None:
+            self.recordFile.close()
+            self.recordFile = None
\ No newline at end of file
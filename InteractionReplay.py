@@ -0,0 +1,165 @@
+import BirdData
+import json
+import os
+import sys
+import time
+import types
+import warnings
+import numpy as np
+
+REPORT_FILENAME = 'replay_report.json'
+
+# Plays a session recorded by InteractionRecorder back against a DataPlot
+# without a display and measures how long every event takes to handle,
+# including redrawing the plot. Clicks are replayed at the zoom they were made
+# at. Slider events are redrawn straight away, the way a non interactive
+# backend does, so each one counts as a full redraw even where the live
+# session would have merged them.
+#
+# The report has the p50, p95 and max handling time in milliseconds of each
+# kind of event and the peaks every column was left with, and whether it was
+# saved. Given the report of an earlier replay it also checks that the peaks
+# came out the same, so a change that speeds up the plot can't quietly change
+# what it picks.
+class InteractionReplay:
+    def __init__(self, recordingPath, source=None, outputDirectory=None, expectPath=None, float32=False, cache=False, cacheDirectory=None, lazy=False, memoryBudget=None):
+        self.recordingPath = recordingPath
+        try:
+            with open(recordingPath) as recordingFile:
+                lines = [json.loads(line) for line in recordingFile if line.strip() != '']
+        except Exception as e:
+            print("ERROR: Could not read the recording " + recordingPath)
+            print(e)
+            sys.exit()
+        if len(lines) == 0 or 'session' not in lines[0]:
+            print("ERROR: " + recordingPath + " is not a recorded session.")
+            sys.exit()
+        session, self.events = lines[0], lines[1:]
+        self.source = source if source != None else session['session']
+
+        self.dataExtractor = BirdData.openDataExtractor(self.source, float32=float32, cache=cache, cacheDirectory=cacheDirectory, lazy=lazy, memoryBudget=memoryBudget)
+        self.availableColumns = self.dataExtractor.getAvailableColumns('background' if session['background'] else 'plot')
+
+        import DataPlot
+        ignore = lambda *args: None
+        self.dataPlot = DataPlot.DataPlot(self.done, ignore, ignore, ignore, ignore, session['background'], prominenceMode=session['prominenceMode'])
+
+        # (group, seconds)
+        self.latencies = []
+        # column -> {'minimums', 'maximums', 'valid'} as the column was left
+        self.peaks = {}
+        # column -> forced
+        self.saved = {}
+
+        with warnings.catch_warnings():
+            # showing the plot does nothing without a display
+            warnings.filterwarnings('ignore', message='.*non-interactive.*')
+            self.replay()
+
+        report = self.report()
+        self.writeReport(report, outputDirectory if outputDirectory != None else os.getcwd())
+        self.printSummary(report)
+        if expectPath != None and not self.compare(report, expectPath):
+            sys.exit(1)
+
+    def done(self, column, forced, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration):
+        self.saved[column] = forced
+
+    def keepPeaks(self):
+        if self.dataPlot.column != None:
+            minimums, maximums = self.dataPlot.peaks.ordered()
+            self.peaks[self.dataPlot.column] = {'minimums': minimums.tolist(), 'maximums': maximums.tolist(), 'valid': bool(self.dataPlot.validateMinMax()[0])}
+
+    def replay(self):
+        self.dataPlot.column = None
+        for event in self.events:
+            kind = event['event']
+            if kind == 'column':
+                if event['column'] not in self.availableColumns:
+                    print("ERROR: Column " + event['column'] + " of the recording is not in " + self.source)
+                    sys.exit()
+                self.keepPeaks()
+                # the same as moving on in a live session
+                self.dataPlot.releaseColumn()
+                xData, yData = self.dataExtractor.extractData(event['column'])
+                handler = lambda: self.dataPlot.initializePlot(event['column'], xData, yData, event['column'] in self.saved, self.saved.get(event['column'], False))
+                group = 'column'
+            elif kind == 'click':
+                self.dataPlot.ax.set_xlim(event['xlim'])
+                self.dataPlot.ax.set_ylim(event['ylim'])
+                click = types.SimpleNamespace(inaxes=self.dataPlot.ax, key=event['key'], xdata=event['x'], ydata=event['y'])
+                handler = lambda: self.dataPlot.onclick(click)
+                group = 'click ' + event['key']
+            elif kind == 'slider':
+                slider = getattr(self.dataPlot, event['slider'] + '_prom_slider')
+                handler = lambda: slider.set_val(event['value'])
+                group = 'slider'
+            elif kind == 'button':
+                press = types.SimpleNamespace(key=event['key'])
+                handler = lambda: getattr(self.dataPlot, event['button'])(press)
+                group = 'button ' + event['button']
+            else:
+                print("WARNING: Skipping unknown event " + kind)
+                continue
+
+            start = time.perf_counter()
+            handler()
+            self.latencies.append((group, time.perf_counter() - start))
+        self.keepPeaks()
+
+    def summarize(self, seconds):
+        milliseconds = np.array(seconds) * 1000
+        return {
+            'count': len(milliseconds),
+            'p50': float(np.percentile(milliseconds, 50)),
+            'p95': float(np.percentile(milliseconds, 95)),
+            'max': float(milliseconds.max())
+        }
+
+    def report(self):
+        groups = {}
+        for group, seconds in self.latencies:
+            groups.setdefault(group, []).append(seconds)
+        return {
+            'recording': self.recordingPath,
+            'source': self.source,
+            'latency': {group: self.summarize(seconds) for group, seconds in sorted(groups.items())},
+            'all': self.summarize([seconds for _, seconds in self.latencies]) if len(self.latencies) > 0 else None,
+            'peaks': self.peaks,
+            'saved': self.saved
+        }
+
+    def writeReport(self, report, outputDirectory):
+        output = os.path.join(outputDirectory, REPORT_FILENAME)
+        try:
+            os.makedirs(outputDirectory, exist_ok=True)
+            with open(output, mode='w') as reportFile:
+                json.dump(report, reportFile, indent=2)
+            print("Replay report written to " + output)
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
+
+    def printSummary(self, report):
+        print(str(len(self.latencies)) + " events replayed, handling time in ms:")
+        for group, summary in report['latency'].items():
+            print("  " + group.ljust(14) + " n=" + str(summary['count']).ljust(5) + " p50 " + format(summary['p50'], '.2f') +
+                  "  p95 " + format(summary['p95'], '.2f') + "  max " + format(summary['max'], '.2f'))
+
+    # returns whether the peaks and saved columns match the expected report
+    def compare(self, report, expectPath):
+        try:
+            with open(expectPath) as expectFile:
+                expected = json.load(expectFile)
+        except Exception as e:
+            print("ERROR: Could not read the expected report " + expectPath)
+            print(e)
+            return False
+
+        columns = sorted(set(report['peaks']) | set(expected['peaks']) | set(report['saved']) | set(expected['saved']))
+        different = [x for x in columns if report['peaks'].get(x) != expected['peaks'].get(x) or report['saved'].get(x) != expected['saved'].get(x)]
+        if len(different) > 0:
+            print("ERROR: The peaks differ from " + expectPath + " for: " + ' '.join(different))
+            return False
+        print("The peaks match " + expectPath)
+        return True
\ No newline at end of file
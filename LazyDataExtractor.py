@@ -0,0 +1,120 @@
+import csv
+import threading
+import DataExtractor
+import Timing
+from collections import OrderedDict
+import numpy as np
+
+# bytes read at a time while building the row index
+SCAN_BLOCK_BYTES = 1 << 24
+# number of rows converted to floats at a time while loading a column
+LOAD_BLOCK_ROWS = 65536
+
+# Reads columns out of the source file only when they are asked for instead of
+# parsing the whole file up front. Opening the file only reads the header and
+# indexes where each row starts so the time to the first plot does not depend
+# on how many columns the file has. Loaded columns are kept until the memory
+# budget (in bytes) is exceeded, least recently used columns are dropped first.
+class LazyDataExtractor:
+    def __init__(self, filename, dtype=np.float64, memoryBudget=None):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.memoryBudget = memoryBudget
+        self.columns = OrderedDict()
+        # columns may be requested from the prefetch thread as well
+        self.lock = threading.Lock()
+        self.timeField, self.availableColumnNames, self.sourceIndex, self.rowStarts, self.rowEnds = self.openFile(filename)
+        # the time series is needed for every plot so it is never evicted
+        self.timeData = self.loadColumn(self.timeField)
+
+    def extractData(self, yFieldname):
+        return (self.timeData, self.getColumn(yFieldname))
+
+    def getAvailableColumns(self, mode):
+        if mode == 'background':
+            return list(filter(lambda val: val.endswith('B'), self.availableColumnNames))
+        elif mode == 'plot':
+            return list(filter(lambda val: not val.endswith('B'), self.availableColumnNames))
+
+    def getColumn(self, fieldname):
+        if fieldname == self.timeField:
+            return self.timeData
+        with self.lock:
+            if fieldname in self.columns:
+                self.columns.move_to_end(fieldname)
+                return self.columns[fieldname]
+            with Timing.timer.measure('load_column', column=fieldname):
+                data = self.loadColumn(fieldname)
+            self.columns[fieldname] = data
+            self.evictColumns()
+            return data
+
+    def memoryUsage(self):
+        return self.timeData.nbytes + sum(data.nbytes for data in self.columns.values())
+
+    def evictColumns(self):
+        if self.memoryBudget == None:
+            return
+        # the column that was just requested is always kept
+        while len(self.columns) > 1 and self.memoryUsage() > self.memoryBudget:
+            self.columns.popitem(last=False)
+
+    def openFile(self, filename):
+        try:
+            with open(filename, mode='rb') as datafile:
+                header = datafile.readline()
+                # First we need to determine the columns that are available
+                # and we can assume that the first column is the time series
+                fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+                dataFieldNames = DataExtractor.getDataFieldNames(fieldnames)
+
+                sourceIndex = {fieldname: i for i, fieldname in enumerate(fieldnames)}
+                rowStarts, rowEnds = self.indexRows(datafile, len(header))
+                return (fieldnames[0], dataFieldNames, sourceIndex, rowStarts, rowEnds)
+        except:
+            print("ERROR: There was an error opening ", filename)
+
+    # finds the byte range of every non blank row after the header
+    def indexRows(self, datafile, dataStart):
+        newlines = []
+        position = dataStart
+        while True:
+            chunk = datafile.read(SCAN_BLOCK_BYTES)
+            if len(chunk) == 0:
+                break
+            newlines.append(np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n')) + position)
+            position += len(chunk)
+        newlines = np.concatenate(newlines) if len(newlines) > 0 else np.array([], dtype=np.int64)
+
+        starts = np.concatenate(([dataStart], newlines + 1)).astype(np.int64)
+        ends = np.concatenate((newlines, [position])).astype(np.int64)
+
+        # drop blank lines, including lines that only hold a carriage return
+        lengths = ends - starts
+        lastBytes = np.zeros(len(starts), dtype=bool)
+        for i in np.flatnonzero(lengths == 1):
+            datafile.seek(starts[i])
+            lastBytes[i] = datafile.read(1) == b'\r'
+        keep = (lengths > 0) & ~lastBytes
+        return (starts[keep], ends[keep])
+
+    def loadColumn(self, fieldname):
+        fieldIndex = self.sourceIndex[fieldname]
+        rowCount = len(self.rowStarts)
+        data = np.empty(rowCount, dtype=self.dtype)
+
+        with open(self.filename, mode='rb') as datafile:
+            for blockStart in range(0, rowCount, LOAD_BLOCK_ROWS):
+                blockEnd = min(blockStart + LOAD_BLOCK_ROWS, rowCount)
+                base = self.rowStarts[blockStart]
+                datafile.seek(base)
+                block = datafile.read(self.rowEnds[blockEnd - 1] - base)
+                values = []
+                for start, end in zip(self.rowStarts[blockStart:blockEnd] - base, self.rowEnds[blockStart:blockEnd] - base):
+                    fields = block[start:end].split(b',', fieldIndex + 1)
+                    value = fields[fieldIndex].strip() if fieldIndex < len(fields) else b''
+                    values.append(value if value != b'' else b'nan')
+                data[blockStart:blockEnd] = np.array(values).astype(self.dtype)
+
+        data.flags.writeable = False
+        return data
@@ -0,0 +1,147 @@
+import BirdData
+import BatchProcessor
+import DataExtractor
+import PeakAnalyzer
+import PlotRenderer
+import csv
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# number of buckets the thumbnail traces are decimated to
+THUMBNAIL_BUCKETS = 200
+
+# the same rule as the Done button of DataPlot, only a wrong number of
+# otherwise well formed pairs is a warning
+warningErrors = ['wrong_peak_count']
+
+def columnStatus(valid, error):
+    if valid:
+        return 'pass'
+    return 'warn' if error in warningErrors else 'fail'
+
+# Analyzes a column and returns what its thumbnail needs, so only a few hundred
+# points go back from the worker instead of the whole trace.
+def thumbnailColumn(task):
+    filename, column, extractorOptions, analyzerOptions = task
+    thumbnail = {'column': column, 'status': 'fail', 'error': 'analysis_error', 'brokenIdx': -1,
+                 'x': [], 'y': [], 'minimums': ([], []), 'maximums': ([], [])}
+    try:
+        xData, yData = BatchProcessor.getExtractor(filename, extractorOptions).extractData(column)
+        analyzer = PeakAnalyzer.PeakAnalyzer(False, **analyzerOptions)
+        if not analyzer.setData(column, xData, yData):
+            thumbnail['error'] = 'invalid_column_name'
+            return thumbnail
+
+        analyzer.analyze()
+        valid, brokenIdx, error = analyzer.validateMinMax()
+        minimums, maximums = analyzer.peaks.ordered()
+        if len(xData) > 0:
+            visible = PlotRenderer.decimate(xData, yData, xData[0], xData[-1], THUMBNAIL_BUCKETS)
+            thumbnail.update({'x': xData[visible], 'y': yData[visible]})
+        thumbnail.update({
+            'status': columnStatus(valid, error),
+            'error': error,
+            'brokenIdx': brokenIdx,
+            'minimums': (xData[minimums], yData[minimums]),
+            'maximums': (xData[maximums], yData[maximums])
+        })
+    except Exception as e:
+        print("ERROR: Could not analyze " + column + " of " + filename)
+        print(e)
+    return thumbnail
+
+def renderPage(task):
+    path, thumbnails, gridColumns, format, dpi = task
+    try:
+        PlotRenderer.renderOverviewPage(path, thumbnails, gridColumns=gridColumns, format=format, dpi=dpi)
+    except Exception as e:
+        print("Could not save " + path + "!")
+        print(e)
+
+# Renders a paged grid of small plots of every selected column so problem
+# columns can be found at a glance instead of stepping through them one at a
+# time. Columns are analyzed and pages are drawn in worker processes. The pages
+# go to the overview directory of the output directory and overview.csv lists
+# the status and page of every column. The columns that need attention are
+# printed with the options that open them in the interactive mode.
+class Overview:
+    def __init__(self, filename, columns=None, outputDirectory=None, startColumn=None, workers=None, pageSize=24, gridColumns=6, prominenceMode='single', float32=False, cache=False, cacheDirectory=None, lazy=False, memoryBudget=None, imageFormat='png', dpi=None):
+        self.filename = filename
+        self.workers = workers if workers != None else os.cpu_count()
+        self.pageSize = pageSize
+        self.gridColumns = gridColumns
+        self.imageFormat = imageFormat
+        self.dpi = dpi
+        self.extractorOptions = {
+            'float32': float32,
+            'cache': cache,
+            'cacheDirectory': cacheDirectory,
+            'lazy': lazy,
+            'memoryBudget': memoryBudget
+        }
+        self.analyzerOptions = {
+            'prominenceMode': prominenceMode
+        }
+
+        try:
+            availableColumns = DataExtractor.readAvailableColumns(filename)
+        except Exception as e:
+            print("ERROR: There was an error opening ", filename)
+            print(e)
+            return
+        availableColumns = list(filter(lambda val: not val.endswith('B'), availableColumns))
+        self.columns = BirdData.selectColumns(availableColumns, columns, startColumn)
+
+        self.outputDirectory, _ = BirdData.createOutputDirectory(filename, outputDirectory, False)
+        self.overviewDirectory = os.path.join(self.outputDirectory, 'overview')
+        os.makedirs(self.overviewDirectory, exist_ok=True)
+
+        self.extractorOptions, temporaryCache = BatchProcessor.shareExtractorCache(self.extractorOptions, self.workers)
+        try:
+            if self.workers > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    self.process(executor.map)
+            else:
+                self.process(map)
+        finally:
+            if temporaryCache != None:
+                shutil.rmtree(temporaryCache, ignore_errors=True)
+
+    def pagePath(self, page):
+        return os.path.join(self.overviewDirectory, 'page_' + str(page + 1).zfill(3) + '.' + self.imageFormat)
+
+    def process(self, mapFunction):
+        # the file is cached by one worker before the others map it
+        if self.workers > 1 and not self.extractorOptions['lazy']:
+            list(mapFunction(BatchProcessor.buildCache, [(self.filename, self.extractorOptions)]))
+        thumbnails = list(mapFunction(thumbnailColumn, [(self.filename, column, self.extractorOptions, self.analyzerOptions) for column in self.columns]))
+
+        pages = [thumbnails[i:i + self.pageSize] for i in range(0, len(thumbnails), self.pageSize)]
+        list(mapFunction(renderPage, [(self.pagePath(page), pageThumbnails, self.gridColumns, self.imageFormat, self.dpi) for page, pageThumbnails in enumerate(pages)]))
+
+        self.writeIndex(thumbnails)
+        self.printSummary(thumbnails, len(pages))
+
+    def writeIndex(self, thumbnails):
+        output = os.path.join(self.outputDirectory, 'overview.csv')
+        try:
+            with open(output, mode='w') as csv_file:
+                writer = csv.writer(csv_file, lineterminator='\n')
+                writer.writerow(['Series', 'Status', 'Error', 'Index', 'Page'])
+                for idx, thumbnail in enumerate(thumbnails):
+                    writer.writerow([thumbnail['column'], thumbnail['status'], thumbnail['error'] if thumbnail['error'] != None else '',
+                                     thumbnail['brokenIdx'], os.path.basename(self.pagePath(idx // self.pageSize))])
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
+
+    def printSummary(self, thumbnails, pageCount):
+        counts = {status: sum(1 for x in thumbnails if x['status'] == status) for status in PlotRenderer.statusColors}
+        print(self.filename + ": " + ', '.join(str(count) + ' ' + status for status, count in counts.items()) + " in " + str(pageCount) + " overview page(s).")
+
+        attention = [x['column'] for x in thumbnails if x['status'] != 'pass']
+        if len(attention) > 0:
+            print("Columns that need attention: " + ' '.join(attention))
+            print("Open them with: --columns " + ' '.join(attention))
+            print("Or step through from the first one with: --start " + attention[0])
\ No newline at end of file
@@ -0,0 +1,287 @@
+import PeakCache
+import PeakSet
+import math
+import numpy as np
+
+# scipy.signal is slow to import and only needed once peaks are looked for, so
+# modes that never analyze a column don't pay for it
+def detectPeaks(data, prominence):
+    from scipy.signal import find_peaks
+    return find_peaks(data, prominence=prominence)
+
+colorNames = {'b': 'Blue', 'uv': 'Ultra Violet', 'bw': 'White'}
+
+# Column names are <color>_<intensity>_<fps>, background columns end in a B.
+# Returns (color, intensity, fps) with the color as written in the name in
+# lower case, or None when the name doesn't have three parts.
+def parseColumnName(column, background=False):
+    parts = column.lower().split("_")
+    if len(parts) != 3:
+        return None
+
+    color, intensity, fps = parts
+    return (color, int(intensity), int(fps[:-1] if background else fps))
+
+# The peak detection and min/max bookkeeping for a single column. DataPlot
+# builds the interactive plot on top of this, the headless modes use it directly.
+class PeakAnalyzer:
+
+    # prominenceMode is how the automatic prominences are found:
+    # 'sweep' lowers the prominence in 0.1 steps running find_peaks at each step,
+    # 'single' gives the same result as 'sweep' from a single find_peaks call and
+    # 'exact' uses the exact prominence of the last required peak instead of a 0.1 step
+    def __init__(self, background, MAX_PROMINENCE=6.0, FALSE_MAXIMUM_ROW_DISTANCE = 30, prominenceMode='single', peakCacheSize=128):
+
+        self.MAX_PROMINENCE = MAX_PROMINENCE
+        self.FALSE_MAXIMUM_ROW_DISTANCE = FALSE_MAXIMUM_ROW_DISTANCE
+        self.prominenceMode = prominenceMode
+
+        # filtered find_peaks results keyed by (column, 'max' or 'min', prominence)
+        self.peakCache = PeakCache.PeakCache(peakCacheSize)
+
+        self.background = background
+
+        self.xData = np.array([])
+        self.yData = np.array([])
+        # the chosen minimums and maximums
+        self.peaks = PeakSet.PeakSet(self.xData, self.yData)
+
+    # returns False if the column name can't be interpreted
+    def setData(self, column, xData, yData):
+
+        self.yData = yData
+        self.xData = xData
+
+        self.peaks = PeakSet.PeakSet(xData, yData)
+
+        self.column = column
+
+        # the cached peaks were found in the old data
+        self.peakCache.clear()
+
+        parsed = parseColumnName(column, self.background)
+        if parsed == None:
+            # should error here
+            return False
+
+        color, self.intensity, self.fps = parsed
+
+        if color in colorNames:
+            self.color = colorNames[color]
+
+        self.min_prominence = 0
+        self.max_prominence = 0
+
+        return True
+
+    # automatically picks the prominences and the min/max points
+    def analyze(self):
+        self.determineMaxProminence()
+        self.determineMinProminence()
+        self.attemptAutomaticDataInterpretation()
+
+    # the result of analyze() in a form that can be handed to another analyzer
+    # with the same data through applyAnalysis()
+    def getAnalysis(self):
+        return {
+            'column': self.column,
+            'xData': self.xData,
+            'yData': self.yData,
+            'max_prominence': self.max_prominence,
+            'min_prominence': self.min_prominence,
+            'minimums': self.peaks.minimums,
+            'maximums': self.peaks.maximums,
+            'maxPeaks': self.findMaxPeaks(),
+            'minPeaks': self.findMinPeaks()
+        }
+
+    def applyAnalysis(self, analysis):
+        self.max_prominence = analysis['max_prominence']
+        self.min_prominence = analysis['min_prominence']
+        self.peaks = PeakSet.PeakSet(self.xData, self.yData, analysis['minimums'], analysis['maximums'])
+        self.peakCache.put((self.column, 'max', self.max_prominence), analysis['maxPeaks'])
+        self.peakCache.put((self.column, 'min', self.min_prominence), analysis['minPeaks'])
+
+    # returns (minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration)
+    def getResults(self):
+        valid, _, error = self.validateMinMax()
+        # We can't calculate the average height and average duration if it's forced
+        if valid or error == 'wrong_peak_count':
+            averageHeight, averageDuration, stdDevHeight, stdDevDuration = self.determineAveragePeakHeightWidth()
+        else:
+            averageHeight = averageDuration = stdDevHeight = stdDevDuration = 'N/A'
+        return (self.getMaximumMinimumPairs(), averageHeight, averageDuration, stdDevHeight, stdDevDuration)
+
+    # This function assumes well formatted minimums and maximums
+    def getMaximumMinimumPairs(self):
+        return self.peaks.pairs()
+
+    # This function assumes well formatted minimums and maximums of the same length
+    def determineAveragePeakHeightWidth(self):
+        return self.peaks.heightWidthStatistics()
+
+    def validateMinMax(self, verbose=False):
+        valid, brokenIdx, error = self.peaks.validate(self.requiredPeaks())
+        if verbose and error == 'zero_length':
+            print("ERROR: Minimums or maximums array length is zero.")
+        elif verbose and error == 'improper_order':
+            print("ERROR: minimums/maximums not in proper order")
+        elif verbose and error == 'len_min_max_different':
+            print("ERROR: Different number of minimums (" + str(len(self.peaks.minimums)) + ") than maximums (" + str(len(self.peaks.maximums)) + ")!")
+        elif verbose and error == 'wrong_peak_count':
+            print("ERROR: Expected " + str(self.requiredPeaks()) + " peaks but have " + str(len(self.peaks.minimums)) + ".")
+        return (valid, brokenIdx, error)
+
+    def title(self):
+        return self.color + ", Intensity " + str(self.intensity) + " @ " + str(self.fps) + " fps (" + self.column + ") Expecting " + str(self.requiredPeaks()) + " pairs"
+
+    def determineMaxProminence(self):
+        if self.prominenceMode != 'sweep':
+            self.max_prominence = self.selectProminence('max')
+            return
+
+        maxAndMin = self.requiredPeaks()
+        self.max_prominence = self.MAX_PROMINENCE
+
+        while self.max_prominence > 0.0:
+            self.max_prominence -= .1
+            max_peaks = self.findMaxPeaks()
+            if len(max_peaks) >= maxAndMin:
+                break
+
+    def determineMinProminence(self):
+        if self.prominenceMode != 'sweep':
+            self.min_prominence = self.selectProminence('min')
+            return
+
+        # determine how many peaks we are looking for
+        maxAndMin = self.requiredPeaks()
+        self.min_prominence = self.MAX_PROMINENCE
+
+        while self.min_prominence > 0.0:
+            self.min_prominence -= .1
+            if len(self.findMinPeaks()) >= maxAndMin:
+                break
+
+    # the prominences that the sweep tries, in order
+    def prominenceSteps(self):
+        steps = []
+        prominence = self.MAX_PROMINENCE
+        while prominence > 0.0:
+            prominence -= .1
+            steps.append(prominence)
+        return steps
+
+    # Finding peaks with a minimum prominence is the same as finding all of the
+    # peaks and keeping the ones that are at least as prominent, so the peaks
+    # and their prominences are only calculated once and every candidate
+    # prominence is checked against them.
+    def selectProminence(self, direction):
+        maxAndMin = self.requiredPeaks()
+        peaks, properties = detectPeaks(self.yData if direction == 'max' else -self.yData, 0)
+        prominences = properties['prominences']
+
+        if self.prominenceMode == 'exact':
+            # the sliders only go up to MAX_PROMINENCE so higher prominences
+            # are clamped to the first step of the sweep
+            candidates = np.unique(np.minimum(prominences, self.MAX_PROMINENCE - .1))[::-1]
+            fallback = 0.0
+        else:
+            candidates = self.prominenceSteps()
+            fallback = candidates[-1] if len(candidates) > 0 else self.MAX_PROMINENCE
+
+        sortedProminences = np.sort(prominences)
+        lastSelected = -1
+        for prominence in candidates:
+            # the peaks only change when the prominence passes one of theirs
+            selected = len(sortedProminences) - np.searchsorted(sortedProminences, prominence, side='left')
+            if selected == lastSelected:
+                continue
+            lastSelected = selected
+            if selected < maxAndMin:
+                continue
+            filtered = self.filterClosePeaks(peaks[prominences >= prominence])
+            if len(filtered) >= maxAndMin:
+                # these are the peaks findMaxPeaks/findMinPeaks will ask for next
+                filtered.flags.writeable = False
+                self.peakCache.put((self.column, direction, prominence), filtered)
+                return prominence
+        return fallback
+
+    def requiredPeaks(self):
+        return math.ceil(self.fps / 5.0)
+
+    def filterClosePeaks(self, peaks):
+        # if there are two peaks of equal height right next to each other
+        # we want to filter that out...
+        # a peak is kept if it is the last one or if the next peak is either
+        # far enough away or a different height
+        peaks = np.asarray(peaks, dtype=np.intp)
+        keep = np.ones(len(peaks), dtype=bool)
+        keep[:-1] = (np.abs(np.diff(peaks)) > self.FALSE_MAXIMUM_ROW_DISTANCE) | (self.yData[peaks[:-1]] != self.yData[peaks[1:]])
+        return peaks[keep]
+
+    def findMaxPeaks(self):
+        return self.findCachedPeaks('max', self.max_prominence)
+
+    def findMinPeaks(self):
+        return self.findCachedPeaks('min', self.min_prominence)
+
+    # the returned arrays are shared with the cache so they are read only
+    def findCachedPeaks(self, direction, prominence):
+        key = (self.column, direction, prominence)
+        peaks = self.peakCache.get(key)
+        if peaks is None:
+            peaks, _ = detectPeaks(self.yData if direction == 'max' else -self.yData, prominence)
+            peaks = self.filterClosePeaks(peaks)
+            peaks.flags.writeable = False
+            self.peakCache.put(key, peaks)
+        return peaks
+
+    def findPeaks(self):
+        return (self.findMaxPeaks(), self.findMinPeaks())
+
+    def attemptAutomaticDataInterpretation(self):
+        minPeaks = self.findMinPeaks()
+        maxPeaks = self.findMaxPeaks()
+
+        # this code does some fancy tricks to find places where
+        # two or more max peaks or two or more min peaks sit between two max/min peaks respectively
+        maxPeaks = self.keepExtremePeakBetween(maxPeaks, minPeaks, highest=True)
+        minPeaks = self.keepExtremePeakBetween(minPeaks, maxPeaks, highest=False)
+
+        # make smarter b_1_75
+
+        self.peaks = PeakSet.PeakSet(self.xData, self.yData, minPeaks, maxPeaks)
+
+    # Where more than one of the (sorted) peaks sit between two neighbouring
+    # bounds only the highest/lowest of them is kept, the first one wins ties.
+    # Peaks outside of the bounds are always kept.
+    def keepExtremePeakBetween(self, peaks, bounds, highest):
+        peaks = np.asarray(peaks, dtype=np.intp)
+        values = self.yData[peaks]
+
+        # bucket b holds the peaks between bounds[b - 1] and bounds[b]
+        buckets = np.searchsorted(bounds, peaks)
+        inside = (buckets > 0) & (buckets < len(bounds))
+
+        # sorted by bucket, then best value first, then by position
+        order = np.lexsort((peaks, -values if highest else values, buckets))
+        firstInBucket = np.ones(len(order), dtype=bool)
+        firstInBucket[1:] = buckets[order][1:] != buckets[order][:-1]
+
+        keep = ~inside
+        keep[order[firstInBucket]] = True
+        return peaks[keep]
+
+    def insertRemoveMax(self, val, action):
+        if action == 'remove':
+            self.peaks.removeMaximum(val)
+        elif action == 'insert':
+            self.peaks.insertMaximum(val)
+
+    def insertRemoveMin(self, val, action):
+        if action == 'remove':
+            self.peaks.removeMinimum(val)
+        elif action == 'insert':
+            self.peaks.insertMinimum(val)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import PeakAnalyzer
+import argparse
+import sys
+import numpy as np
+
+# Checks that the vectorized keepExtremePeakBetween and filterClosePeaks of
+# PeakAnalyzer pick the same peaks as the loops they replaced. The loops are
+# kept here as they were and both versions are run on random peak sets, half
+# of them on quantized data where many peaks have the same height, since that
+# is where the tie breaking and the close peak filter matter. Any difference
+# is printed and fails the run.
+
+# the old pairing of attemptAutomaticDataInterpretation, one direction of it
+def referenceKeepExtremePeakBetween(yData, peaks, bounds, highest):
+    peaks = list(peaks)
+    for i in range(0, len(bounds) - 1):
+        peak1 = bounds[i]
+        peak2 = bounds[i+1]
+        midPeaks = [(yData[x], i) for i, x in enumerate(peaks) if x > peak1 and x < peak2]
+        if len(midPeaks) > 1:
+            # find the max/min value of the mid peaks
+            extremeValue = max(midPeaks, key=lambda item: item[0]) if highest else min(midPeaks, key=lambda item: item[0])
+            midPeaks.remove(extremeValue)
+            valuesToRemove = list(map(lambda val: peaks[val[1]], midPeaks))
+            for val in valuesToRemove:
+                peaks.remove(val)
+    return np.array(peaks)
+
+def referenceFilterClosePeaks(yData, peaks, falseMaximumRowDistance):
+    result = []
+    for idx, val in enumerate(peaks):
+        if idx == len(peaks) - 1 or \
+                abs(peaks[idx] - peaks[idx + 1]) > falseMaximumRowDistance or \
+                yData[peaks[idx]] != yData[peaks[idx + 1]]:
+            result.append(val)
+    return np.array(result)
+
+# returns (yData, maxPeaks, minPeaks) with the max and min peaks at different rows
+def randomPeakSet(random, quantized):
+    rows = int(random.integers(1, 2000))
+    yData = random.normal(size=rows)
+    if quantized:
+        yData = np.round(yData * random.integers(1, 4)) / 4
+    rowsOfPeaks = random.permutation(rows)[:int(random.integers(0, rows + 1))]
+    split = int(random.integers(0, len(rowsOfPeaks) + 1))
+    return (yData, np.sort(rowsOfPeaks[:split]), np.sort(rowsOfPeaks[split:]))
+
+def same(result, expected):
+    return len(result) == len(expected) and bool(np.all(np.asarray(result) == np.asarray(expected)))
+
+# returns the descriptions of the peak sets where the two versions differ
+def checkPeakSets(count, seed):
+    random = np.random.default_rng(seed)
+    analyzer = PeakAnalyzer.PeakAnalyzer(False)
+    problems = []
+    for i in range(count):
+        quantized = i % 2 == 1
+        yData, maxPeaks, minPeaks = randomPeakSet(random, quantized)
+        analyzer.yData = yData
+        name = "set " + str(i) + (" (quantized)" if quantized else "")
+
+        for peaks in [maxPeaks, minPeaks]:
+            if not same(analyzer.filterClosePeaks(peaks), referenceFilterClosePeaks(yData, peaks, analyzer.FALSE_MAXIMUM_ROW_DISTANCE)):
+                problems.append(name + ": filterClosePeaks")
+
+        # in the order attemptAutomaticDataInterpretation pairs them
+        expectedMax = referenceKeepExtremePeakBetween(yData, maxPeaks, minPeaks, True)
+        resultMax = analyzer.keepExtremePeakBetween(maxPeaks, minPeaks, highest=True)
+        if not same(resultMax, expectedMax):
+            problems.append(name + ": keepExtremePeakBetween highest")
+        expectedMin = referenceKeepExtremePeakBetween(yData, minPeaks, expectedMax, False)
+        if not same(analyzer.keepExtremePeakBetween(minPeaks, expectedMax, highest=False), expectedMin):
+            problems.append(name + ": keepExtremePeakBetween lowest")
+    return problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(allow_abbrev=False)
+    parser.add_argument('--count', type=int, default=1000, help="Number of random peak sets to check.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random peak sets.")
+    args = vars(parser.parse_args())
+
+    problems = checkPeakSets(args['count'], args['seed'])
+    if len(problems) > 0:
+        print("ERROR: The peaks differ from the reference for " + str(len(problems)) + " check(s):")
+        for problem in problems[:20]:
+            print("  " + problem)
+        sys.exit(1)
+    print("The peaks match the reference on " + str(args['count']) + " peak sets.")
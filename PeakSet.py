@@ -0,0 +1,132 @@
+import numpy as np
+
+# The chosen minimums and maximums of a column, each kept as a sorted array of
+# row indices. Edits find their place with a binary search. Everything derived
+# from the peaks (their order, the validation result, the pairs and the
+# statistics) is worked out once after an edit and reused until the next one,
+# so redrawing and saving never sort or walk the peaks again.
+#
+# When the first peak is a maximum the minimums and maximums are offset: the
+# recording started partway through a pulse, so the last minimum belongs with
+# the first maximum.
+class PeakSet:
+    def __init__(self, xData, yData, minimums=(), maximums=()):
+        self.xData = xData
+        self.yData = yData
+        self.minimums = np.unique(np.asarray(minimums, dtype=np.intp))
+        self.maximums = np.unique(np.asarray(maximums, dtype=np.intp))
+        self.edited()
+
+    # drops everything that was worked out from the old peaks
+    def edited(self):
+        self.orderedPeaks = None
+        self.validation = None
+        self.statistics = None
+
+    def insertMinimum(self, index):
+        self.minimums = self.insert(self.minimums, index)
+
+    def removeMinimum(self, index):
+        self.minimums = self.remove(self.minimums, index)
+
+    def insertMaximum(self, index):
+        self.maximums = self.insert(self.maximums, index)
+
+    def removeMaximum(self, index):
+        self.maximums = self.remove(self.maximums, index)
+
+    # the arrays are replaced rather than changed so that anything still
+    # holding on to the old ones, like a queued image, keeps seeing them
+    def insert(self, peaks, index):
+        position = np.searchsorted(peaks, index)
+        if position < len(peaks) and peaks[position] == index:
+            return peaks
+        self.edited()
+        return np.insert(peaks, position, index)
+
+    def remove(self, peaks, index):
+        position = np.searchsorted(peaks, index)
+        if position == len(peaks) or peaks[position] != index:
+            return peaks
+        self.edited()
+        return np.delete(peaks, position)
+
+    def clear(self):
+        self.minimums = np.array([], dtype=np.intp)
+        self.maximums = np.array([], dtype=np.intp)
+        self.edited()
+
+    def isOffset(self):
+        return len(self.minimums) > 0 and len(self.maximums) > 0 and self.minimums[0] > self.maximums[0]
+
+    # returns (minimums, maximums) with the last minimum moved to the front when
+    # they are offset, so that minimums[i] and maximums[i] form the i'th pair
+    def ordered(self):
+        if self.orderedPeaks == None:
+            if self.isOffset():
+                self.orderedPeaks = (np.roll(self.minimums, 1), self.maximums)
+            else:
+                self.orderedPeaks = (self.minimums, self.maximums)
+        return self.orderedPeaks
+
+    # returns (valid, brokenIdx, error) the same way PeakAnalyzer.validateMinMax does
+    def validate(self, requiredPeaks):
+        if self.validation == None or self.validation[0] != requiredPeaks:
+            self.validation = (requiredPeaks, self.findProblem(requiredPeaks))
+        return self.validation[1]
+
+    def findProblem(self, requiredPeaks):
+        minimums, maximums = self.ordered()
+        minLength = min(len(minimums), len(maximums))
+
+        if len(minimums) == 0 or len(maximums) == 0:
+            return (False, -1, 'zero_length')
+
+        # check that the data is in proper order
+        offset = self.isOffset()
+        if (offset and minimums[0] < maximums[0]) or (not offset and minimums[0] > maximums[0]):
+            return (False, 0, 'improper_order')
+
+        # every pair after the first has to be a minimum followed by its maximum,
+        # followed by the next pair
+        interwoven = np.stack((minimums[1:minLength], maximums[1:minLength]), axis=1).ravel()
+        outOfOrder = np.flatnonzero(interwoven[:-1] > interwoven[1:])
+        if len(outOfOrder) > 0:
+            return (False, int(outOfOrder[0] / 2) + 1, 'improper_order')
+
+        if len(minimums) != len(maximums):
+            return (False, minLength, 'len_min_max_different')
+
+        if requiredPeaks != len(minimums) or requiredPeaks != len(maximums):
+            return (False, -1, 'wrong_peak_count')
+
+        return (True, -1, None)
+
+    # returns [((minX, minY), (maxX, maxY))] with '-' for a missing minimum or maximum
+    def pairs(self):
+        minimums, maximums = self.ordered()
+        results = []
+        for i in range(max(len(minimums), len(maximums))):
+            _min = (self.xData[minimums[i]], self.yData[minimums[i]]) if i < len(minimums) else ('-', '-')
+            _max = (self.xData[maximums[i]], self.yData[maximums[i]]) if i < len(maximums) else ('-', '-')
+            results.append((_min, _max))
+        return results
+
+    # returns (averageHeight, averageWidth, heightStdDev, widthStdDev), there
+    # have to be as many minimums as maximums
+    def heightWidthStatistics(self):
+        if self.statistics == None:
+            minimums, maximums = self.ordered()
+            heights = self.yData[maximums] - self.yData[minimums]
+            widths = self.xData[maximums] - self.xData[minimums]
+            # the first width of offset data is only part of a pulse
+            if self.isOffset():
+                widths = widths[1:]
+
+            # this is wrong, average width might not be correct
+            averageWidth = np.mean(widths)
+            # We can't calculate the offset for a single value
+            if self.isOffset() and len(minimums) == 1:
+                averageWidth = 'N/A'
+            self.statistics = (np.mean(heights), averageWidth, np.std(heights), np.std(widths))
+        return self.statistics
\ No newline at end of file
@@ -1,37 +1,187 @@
 import csv
+import Timing
 import os
+import json
 import datetime
+import numpy as np
 
+JOURNAL_FILENAME = 'plot_data.journal'
+
+# the statistics in the order they are written to the csv
+statisticNames = ['averageDuration', 'averageHeight', 'stdDevDuration', 'stdDevHeight']
+
+# values read back from the journal are strings as well, so only the exact
+# placeholder counts as missing
+def isPlaceholder(value, placeholder):
+    return isinstance(value, str) and value == placeholder
+
+# Results are kept in numpy arrays with one row per column, in the order the
+# columns were first added. Missing values are NaN, statistics that couldn't
+# be calculated are also marked in hasStatistics and pairs past a column's
+# number of minimums or maximums are left empty. The csv still shows those as
+# 'N/A' and '-'. Values are stored in the dtype of the data so they are
+# written exactly as they were computed.
+#
+# When a journal directory is given every added line is also appended to a
+# journal there and synced to disk before addLine returns, so a crash loses
+# nothing that was saved. The journal holds one json object per line, later
+# lines replace earlier lines of the same column. It is read back when the
+# writer is created again for the same directory and compacted to one line per
+# column whenever the csv is written.
+#
+# outputFormats can add 'npz' and 'parquet' files of the same results next to
+# the csv, parquet needs pyarrow.
 class PlotDataWriter:
 
-    def __init__(self):
-        self.data = {}
+    def __init__(self, journalDirectory=None, dtype=np.float64, outputFormats=()):
+        self.dtype = np.dtype(dtype)
+        self.outputFormats = outputFormats
+        self.columns = []
+        self.rows = {}
+        self.forced = np.zeros(0, dtype=bool)
+        self.hasStatistics = np.zeros((0, len(statisticNames)), dtype=bool)
+        self.statistics = np.zeros((0, len(statisticNames)), dtype=self.dtype)
+        self.minCounts = np.zeros(0, dtype=np.intp)
+        self.maxCounts = np.zeros(0, dtype=np.intp)
+        # (rows, pairs, 4) holding min x, min y, max x and max y
+        self.pairs = np.zeros((0, 0, 4), dtype=self.dtype)
 
+        self.journal = None
+        if journalDirectory != None:
+            self.journalPath = os.path.join(journalDirectory, JOURNAL_FILENAME)
+            self.loadJournal()
+            # a crash may have left half a line at the end, so the journal is
+            # always rewritten before anything is appended to it
+            self.compactJournal()
+
+    # minMaxPairs and the statistics are in the form PeakAnalyzer.getResults
+    # returns them, '-' marks a missing minimum or maximum and 'N/A' missing
+    # statistics
     def addLine(self, column, forced, minMaxPairs, averageHeight, averageDuration, stdDevHeight, stdDevDuration):
-        self.data[column] = {
-            'forced': forced,
-            'minMaxPairs': minMaxPairs,
-            'averageHeight': averageHeight,
-            'averageDuration': averageDuration,
-            'stdDevHeight': stdDevHeight,
-            'stdDevDuration': stdDevDuration
-        }
+        row = self.getRow(column)
+        pairCount = len(minMaxPairs)
+        self.reserve(len(self.columns), pairCount)
+
+        self.forced[row] = forced
+        values = {'averageDuration': averageDuration, 'averageHeight': averageHeight, 'stdDevDuration': stdDevDuration, 'stdDevHeight': stdDevHeight}
+        self.hasStatistics[row] = [not isPlaceholder(values[name], 'N/A') for name in statisticNames]
+        self.statistics[row] = [np.nan if isPlaceholder(values[name], 'N/A') else values[name] for name in statisticNames]
+
+        self.pairs[row] = np.nan
+        # the minimums and maximums come first in the pairs, '-' only follows them
+        self.minCounts[row] = sum(1 for _min, _ in minMaxPairs if not isPlaceholder(_min[0], '-'))
+        self.maxCounts[row] = sum(1 for _, _max in minMaxPairs if not isPlaceholder(_max[0], '-'))
+        for i, (_min, _max) in enumerate(minMaxPairs):
+            if i < self.minCounts[row]:
+                self.pairs[row, i, 0:2] = _min
+            if i < self.maxCounts[row]:
+                self.pairs[row, i, 2:4] = _max
+
+        if self.journal != None:
+            with Timing.timer.measure('journal', column=column):
+                self.journal.write(self.journalLine(column))
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+
+    def getRow(self, column):
+        if column not in self.rows:
+            self.rows[column] = len(self.columns)
+            self.columns.append(column)
+        return self.rows[column]
+
+    # grows the arrays, doubling the number of rows so adding lines stays cheap
+    def reserve(self, rowCount, pairCount):
+        rows = len(self.forced)
+        if rowCount > rows:
+            newRows = max(rowCount, 2 * rows, 16)
+            self.forced = np.concatenate((self.forced, np.zeros(newRows - rows, dtype=bool)))
+            self.hasStatistics = np.concatenate((self.hasStatistics, np.zeros((newRows - rows, len(statisticNames)), dtype=bool)))
+            self.statistics = np.concatenate((self.statistics, np.full((newRows - rows, len(statisticNames)), np.nan, dtype=self.dtype)))
+            self.minCounts = np.concatenate((self.minCounts, np.zeros(newRows - rows, dtype=np.intp)))
+            self.maxCounts = np.concatenate((self.maxCounts, np.zeros(newRows - rows, dtype=np.intp)))
+            self.pairs = np.concatenate((self.pairs, np.full((newRows - rows,) + self.pairs.shape[1:], np.nan, dtype=self.dtype)))
+        if pairCount > self.pairs.shape[1]:
+            padding = np.full((self.pairs.shape[0], pairCount - self.pairs.shape[1], 4), np.nan, dtype=self.dtype)
+            self.pairs = np.concatenate((self.pairs, padding), axis=1)
 
     # returns the data status of the column
     # (Saved, Forced)
     def getColumnStatus(self, column):
-        if column in self.data:
-            return (True, self.data[column]['forced'])
+        if column in self.rows:
+            return (True, bool(self.forced[self.rows[column]]))
         else:
             return (False, False)
 
+    def getColumns(self):
+        return list(self.columns)
+
+    def formatValue(self, value):
+        return str(self.dtype.type(value))
+
+    # returns the csv cells of the statistics and of the pairs of a row
+    def formatRow(self, row):
+        statistics = [self.formatValue(value) if available else 'N/A' for value, available in zip(self.statistics[row], self.hasStatistics[row])]
+
+        pairs = []
+        for i in range(max(self.minCounts[row], self.maxCounts[row])):
+            minX, minY, maxX, maxY = self.pairs[row, i]
+            pairs.append(((self.formatValue(minX), self.formatValue(minY)) if i < self.minCounts[row] else ('-', '-'),
+                          (self.formatValue(maxX), self.formatValue(maxY)) if i < self.maxCounts[row] else ('-', '-')))
+        return (statistics, pairs)
+
+    # the values are stored the way they are written to the csv so a resumed
+    # session writes exactly the same file
+    def journalLine(self, column):
+        row = self.rows[column]
+        statistics, pairs = self.formatRow(row)
+        entry = {'column': column, 'forced': bool(self.forced[row]), 'minMaxPairs': pairs}
+        entry.update(zip(statisticNames, statistics))
+        return json.dumps(entry) + '\n'
+
+    def loadJournal(self):
+        try:
+            with open(self.journalPath) as journalFile:
+                for line in journalFile:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        print("WARNING: Ignoring an incomplete line at the end of " + self.journalPath)
+                        break
+                    self.addLine(entry['column'], entry['forced'], [(tuple(_min), tuple(_max)) for _min, _max in entry['minMaxPairs']],
+                                 entry['averageHeight'], entry['averageDuration'], entry['stdDevHeight'], entry['stdDevDuration'])
+        except FileNotFoundError:
+            pass
+
+    def compactJournal(self):
+        if self.journal != None:
+            self.journal.close()
+        temporaryPath = self.journalPath + '.tmp'
+        with open(temporaryPath, mode='w') as journalFile:
+            for column in self.columns:
+                journalFile.write(self.journalLine(column))
+            journalFile.flush()
+            os.fsync(journalFile.fileno())
+        os.replace(temporaryPath, self.journalPath)
+        self.journal = open(self.journalPath, mode='a')
+
+    def close(self):
+        if self.journal != None:
+            self.journal.close()
+            self.journal = None
+
     def writeToFile(self, outputDirectory):
-        # find max number of min/max pairs
-        maxPairs = 0
-        for column in self.data:
-            row = self.data[column]
-            if len(row['minMaxPairs']) > maxPairs:
-                maxPairs = len(row['minMaxPairs'])
+        with Timing.timer.measure('write_csv', column=''):
+            self.writeCsv(outputDirectory)
+        if 'npz' in self.outputFormats:
+            with Timing.timer.measure('write_npz', column=''):
+                self.writeNpz(outputDirectory)
+        if 'parquet' in self.outputFormats:
+            with Timing.timer.measure('write_parquet', column=''):
+                self.writeParquet(outputDirectory)
+
+    def writeCsv(self, outputDirectory):
+        rowCount = len(self.columns)
+        maxPairs = int(np.max(np.maximum(self.minCounts[:rowCount], self.maxCounts[:rowCount]), initial=0))
 
         fieldnames = ['Series', 'Forced', 'Avg. Duration', 'Avg. Height', 'Std Dev. Duration', 'Std Dev. Height']
         for i in range(0, maxPairs):
@@ -41,22 +191,81 @@ class PlotDataWriter:
         output = os.path.join(outputDirectory, 'plot_data.csv')
 
         try:
-            with open(output, mode='w') as csv_file:
+            # the old csv is only replaced once the new one is complete
+            with open(output + '.tmp', mode='w') as csv_file:
                 writer = csv.writer(csv_file, lineterminator='\n')
                 writer.writerow(fieldnames)
 
-                for column in self.data:
-                    data = self.data[column]
-                    row = [column, str(data['forced']).lower(), data['averageDuration'], data['averageHeight'], data['stdDevDuration'], data['stdDevHeight']]
-                    for pair in data['minMaxPairs']:
-                        _min, _max = pair
-                        minX, minY = _min
-                        maxX, maxY = _max
-                        row.append(str(minX) + ', ' + str(minY))
-                        row.append(str(maxX) + ', ' + str(maxY))
-                    writer.writerow(row)
+                for row, column in enumerate(self.columns):
+                    statistics, pairs = self.formatRow(row)
+                    cells = [column, str(bool(self.forced[row])).lower()] + statistics
+                    for (minX, minY), (maxX, maxY) in pairs:
+                        cells.append(minX + ', ' + minY)
+                        cells.append(maxX + ', ' + maxY)
+                    writer.writerow(cells)
 
                 csv_file.close()
+            os.replace(output + '.tmp', output)
+
+            if self.journal != None:
+                self.compactJournal()
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
+
+    # every array has one entry per column, the pair arrays are padded with NaN
+    # up to the largest number of pairs
+    def getArrays(self):
+        rowCount = len(self.columns)
+        maxPairs = int(np.max(np.maximum(self.minCounts[:rowCount], self.maxCounts[:rowCount]), initial=0))
+        pairs = self.pairs[:rowCount, :maxPairs]
+        arrays = {
+            'series': np.array(self.columns, dtype=str),
+            'forced': self.forced[:rowCount].copy(),
+            'average_duration': self.statistics[:rowCount, 0].copy(),
+            'average_height': self.statistics[:rowCount, 1].copy(),
+            'std_dev_duration': self.statistics[:rowCount, 2].copy(),
+            'std_dev_height': self.statistics[:rowCount, 3].copy(),
+            'min_count': self.minCounts[:rowCount].copy(),
+            'max_count': self.maxCounts[:rowCount].copy(),
+            'min_x': pairs[:, :, 0].copy(),
+            'min_y': pairs[:, :, 1].copy(),
+            'max_x': pairs[:, :, 2].copy(),
+            'max_y': pairs[:, :, 3].copy()
+        }
+        return arrays
+
+    def writeNpz(self, outputDirectory):
+        output = os.path.join(outputDirectory, 'plot_data.npz')
+        try:
+            # np.savez adds .npz to names that don't already end in it
+            with open(output + '.tmp', mode='wb') as npzFile:
+                np.savez(npzFile, **self.getArrays())
+            os.replace(output + '.tmp', output)
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
+
+    # the pairs become list columns holding only the pairs each series has
+    def writeParquet(self, outputDirectory):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            print("WARNING: pyarrow is not installed, plot_data.parquet was not written.")
+            return
+
+        output = os.path.join(outputDirectory, 'plot_data.parquet')
+        try:
+            arrays = self.getArrays()
+            table = {}
+            for name, values in arrays.items():
+                if values.ndim == 1:
+                    table[name] = pyarrow.array(values)
+            for name, countName in [('min_x', 'min_count'), ('min_y', 'min_count'), ('max_x', 'max_count'), ('max_y', 'max_count')]:
+                table[name] = pyarrow.array([values[:count].tolist() for values, count in zip(arrays[name], arrays[countName])])
+            pyarrow.parquet.write_table(pyarrow.table(table), output + '.tmp')
+            os.replace(output + '.tmp', output)
         except Exception as e:
             print("ERROR: There was an error outputing to ", output)
             print(e)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import numpy as np
+
+colorSets = ['blue', 'orange', 'purple', 'magenta', 'brown', 'gold', 'lightskyblue', 'gray', 'blueviolet', 'olive']
+
+# colors of the overview thumbnails by validation status
+statusColors = {'pass': 'green', 'warn': 'orange', 'fail': 'red'}
+
+# Draws columns into standalone Agg figures. Nothing here touches pyplot so it
+# is safe to use without a display and outside of the main thread. matplotlib
+# itself is only imported once an image is rendered.
+
+# returns the (color, style) of the idx'th min/max annotation
+def annotationStyle(idx, valid, brokenIdx):
+    error = not valid and brokenIdx == idx
+    color = 'red' if error else colorSets[idx % len(colorSets)]
+    style = 'italic' if error else 'normal'
+    return (color, style)
+
+# Returns the indices of the samples worth drawing between xMin and xMax when
+# the plot is buckets pixels wide. Traces with far more samples than pixels are
+# split into buckets and only the lowest and highest sample of each bucket is
+# kept, so every peak still shows up exactly where it is. The samples just
+# outside of the range are kept so the line runs to the edges. xData has to be
+# sorted.
+def decimate(xData, yData, xMin, xMax, buckets):
+    start = max(int(np.searchsorted(xData, xMin, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(xData, xMax, side='right')) + 1, len(xData))
+    count = stop - start
+    buckets = max(int(buckets), 1)
+    if count <= 4 * buckets:
+        return np.arange(start, stop)
+
+    bucketSize = -(-count // buckets)
+    whole = count // bucketSize * bucketSize
+    segments = yData[start:start + whole].reshape(-1, bucketSize)
+    offsets = np.arange(start, start + whole, bucketSize)
+    lowest = np.argmin(segments, axis=1) + offsets
+    highest = np.argmax(segments, axis=1) + offsets
+    # the two samples of every bucket are kept in the order they occur
+    indices = [np.sort(np.stack((lowest, highest), axis=1), axis=1).ravel()]
+    if whole < count:
+        rest = yData[start + whole:stop]
+        indices.append(np.sort([start + whole + np.argmin(rest), start + whole + np.argmax(rest)]))
+    indices = np.concatenate([[start]] + indices + [[stop - 1]])
+    return indices[np.concatenate(([True], np.diff(indices) != 0))]
+
+# minimums and maximums are expected in the order given by PeakSet.ordered
+def annotateMinMax(ax, xData, yData, minimums, maximums, valid, brokenIdx, fontsize=8):
+    for idx, val in enumerate(minimums):
+        color, style = annotationStyle(idx, valid, brokenIdx)
+        ax.annotate(str(idx + 1) + " min", (xData[val], yData[val]), textcoords='offset pixels', xytext=(15, -15), fontweight='bold', style=style,
+                fontsize=fontsize, color=color, arrowprops={'arrowstyle': '->'})
+
+    for idx, val in enumerate(maximums):
+        color, style = annotationStyle(idx, valid, brokenIdx)
+        ax.annotate(str(idx + 1) + " max", (xData[val], yData[val]), textcoords='offset pixels',
+                         xytext=(15, 15), fontweight='bold', style=style,
+                         fontsize=fontsize, color=color, arrowprops={'arrowstyle': '->'})
+
+def renderColumn(path, xData, yData, minimums, maximums, title, valid, brokenIdx, titleColor='black', format=None, dpi=None):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Voltage")
+    if len(xData) > 0:
+        visible = decimate(xData, yData, xData[0], xData[-1], ax.bbox.width * (1 if dpi == None else dpi / fig.dpi))
+        ax.plot(xData[visible], yData[visible])
+    annotateMinMax(ax, xData, yData, minimums, maximums, valid, brokenIdx)
+    ax.set_title(title, color=titleColor)
+    fig.savefig(path, format=format, dpi=dpi)
+
+
+# Draws a page of the overview, a grid of small plots with one thumbnail per
+# column. thumbnails is a list of dicts as made by Overview.thumbnailColumn,
+# their traces are already decimated. The title and frame of every plot are
+# colored by its status and the pair that broke validation is marked in red.
+def renderOverviewPage(path, thumbnails, gridColumns=6, format=None, dpi=None):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    gridRows = max(-(-len(thumbnails) // gridColumns), 1)
+    fig = Figure(figsize=(2.5 * gridColumns, 2 * gridRows))
+    FigureCanvasAgg(fig)
+    fig.subplots_adjust(left=0.04, right=0.98, bottom=0.04, top=0.96, wspace=0.25, hspace=0.45)
+
+    for idx, thumbnail in enumerate(thumbnails):
+        ax = fig.add_subplot(gridRows, gridColumns, idx + 1)
+        ax.plot(thumbnail['x'], thumbnail['y'], linewidth=0.6)
+        brokenIdx = thumbnail['brokenIdx']
+        for name, marker, color in [('minimums', 'v', 'blue'), ('maximums', '^', 'orange')]:
+            peakX, peakY = thumbnail[name]
+            colors = ['red' if i == brokenIdx else color for i in range(len(peakX))]
+            ax.scatter(peakX, peakY, marker=marker, s=9, c=colors, zorder=3)
+
+        statusColor = statusColors[thumbnail['status']]
+        ax.set_title(thumbnail['column'] + ' ' + thumbnail['status'], fontsize=7, color=statusColor)
+        for spine in ax.spines.values():
+            spine.set_edgecolor(statusColor)
+            spine.set_linewidth(1.5 if thumbnail['status'] != 'pass' else 0.8)
+        ax.tick_params(labelsize=5)
+
+    fig.savefig(path, format=format, dpi=dpi)
\ No newline at end of file
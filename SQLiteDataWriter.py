@@ -0,0 +1,133 @@
+import PeakAnalyzer
+import math
+import os
+import sqlite3
+import datetime
+
+# every run is one output directory of one source file
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        output_directory TEXT NOT NULL,
+        written TEXT NOT NULL,
+        UNIQUE (source, output_directory))""",
+    """CREATE TABLE IF NOT EXISTS series (
+        id INTEGER PRIMARY KEY,
+        run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+        source TEXT NOT NULL,
+        series TEXT NOT NULL,
+        color TEXT,
+        intensity INTEGER,
+        fps INTEGER,
+        background INTEGER NOT NULL,
+        forced INTEGER,
+        average_duration REAL,
+        average_height REAL,
+        std_dev_duration REAL,
+        std_dev_height REAL,
+        average REAL,
+        variance REAL)""",
+    """CREATE TABLE IF NOT EXISTS points (
+        series_id INTEGER NOT NULL REFERENCES series(id) ON DELETE CASCADE,
+        pair INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        x REAL NOT NULL,
+        y REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS runs_source ON runs (source)",
+    "CREATE INDEX IF NOT EXISTS series_run ON series (run_id, background)",
+    "CREATE INDEX IF NOT EXISTS series_source ON series (source, series)",
+    "CREATE INDEX IF NOT EXISTS series_name ON series (series)",
+    "CREATE INDEX IF NOT EXISTS series_recording ON series (color, intensity, fps)",
+    "CREATE INDEX IF NOT EXISTS points_series ON points (series_id, kind, pair)"
+]
+
+# NaN and 'N/A' mark a missing value in the writers, sqlite uses NULL
+def toReal(value):
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+# (color, intensity, fps) of the column or Nones when its name can't be parsed
+def recordingFields(column, background):
+    try:
+        parsed = PeakAnalyzer.parseColumnName(column, background)
+    except ValueError:
+        parsed = None
+    return parsed if parsed != None else (None, None, None)
+
+# Collects the results of every run in one sqlite database so they can be
+# queried across files and runs, e.g. every UV column at 60 fps, instead of
+# reading each run's csv. The results of a run are written in one transaction
+# once the other writers have written theirs. Writing the same source and
+# output directory again replaces what was stored for it before, so saving a
+# session repeatedly or resuming it doesn't add duplicates. Several processes
+# can write to the same database, they wait for each other's transactions.
+class SQLiteDataWriter:
+    def __init__(self, databasePath):
+        self.databasePath = databasePath
+        self.connection = None
+
+    def connect(self):
+        if self.connection == None:
+            directory = os.path.dirname(os.path.abspath(self.databasePath))
+            os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.databasePath, timeout=60)
+            # readers don't block the writers
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA foreign_keys=ON")
+            with self.connection:
+                for statement in SCHEMA:
+                    self.connection.execute(statement)
+        return self.connection
+
+    # replaces the results of one kind of the run, returns (run id, absolute source)
+    def replaceRun(self, connection, source, outputDirectory, background):
+        source = os.path.abspath(source)
+        outputDirectory = os.path.abspath(outputDirectory)
+        connection.execute("INSERT INTO runs (source, output_directory, written) VALUES (?, ?, ?) ON CONFLICT (source, output_directory) DO UPDATE SET written = excluded.written",
+                           (source, outputDirectory, datetime.datetime.now().isoformat(timespec='seconds')))
+        runId = connection.execute("SELECT id FROM runs WHERE source = ? AND output_directory = ?", (source, outputDirectory)).fetchone()[0]
+        connection.execute("DELETE FROM series WHERE run_id = ? AND background = ?", (runId, int(background)))
+        return (runId, source)
+
+    def writePlotData(self, source, outputDirectory, plotDataWriter, background=False):
+        arrays = plotDataWriter.getArrays()
+        try:
+            connection = self.connect()
+            with connection:
+                runId, source = self.replaceRun(connection, source, outputDirectory, background)
+                points = []
+                for row, column in enumerate(arrays['series']):
+                    column = str(column)
+                    cursor = connection.execute("INSERT INTO series (run_id, source, series, color, intensity, fps, background, forced, average_duration, average_height, std_dev_duration, std_dev_height) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                                (runId, source, column, *recordingFields(column, background), int(background), int(arrays['forced'][row]),
+                                                 toReal(arrays['average_duration'][row]), toReal(arrays['average_height'][row]),
+                                                 toReal(arrays['std_dev_duration'][row]), toReal(arrays['std_dev_height'][row])))
+                    seriesId = cursor.lastrowid
+                    for kind in ['min', 'max']:
+                        for pair in range(arrays[kind + '_count'][row]):
+                            points.append((seriesId, pair + 1, kind, float(arrays[kind + '_x'][row, pair]), float(arrays[kind + '_y'][row, pair])))
+                connection.executemany("INSERT INTO points (series_id, pair, kind, x, y) VALUES (?, ?, ?, ?, ?)", points)
+        except Exception as e:
+            print("ERROR: There was an error writing to the database ", self.databasePath)
+            print(e)
+
+    def writeBackgroundData(self, source, outputDirectory, backgroundDataWriter):
+        try:
+            connection = self.connect()
+            with connection:
+                runId, source = self.replaceRun(connection, source, outputDirectory, True)
+                connection.executemany("INSERT INTO series (run_id, source, series, color, intensity, fps, background, average, variance) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)",
+                                       [(runId, source, column, *recordingFields(column, True), toReal(values['average']), toReal(values['variance']))
+                                        for column, values in backgroundDataWriter.data.items()])
+        except Exception as e:
+            print("ERROR: There was an error writing to the database ", self.databasePath)
+            print(e)
+
+    def close(self):
+        if self.connection != None:
+            self.connection.close()
+            self.connection = None
\ No newline at end of file
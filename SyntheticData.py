@@ -0,0 +1,63 @@
+import math
+import numpy as np
+
+colors = ['b', 'uv', 'bw']
+framesPerSecond = [5, 15, 30, 60]
+
+# Generates recordings shaped like the ones the rigs produce, for trying
+# things out and benchmarking without real data. Every data column is named
+# color_intensity_fps and holds a noisy sine wave with exactly requiredPeaks()
+# maximum/minimum pairs so the automatic interpretation has a known answer.
+# Each data column gets a background column of plain noise next to it.
+class SyntheticData:
+    def __init__(self, rows=3000, width=24, noise=0.05, amplitude=2.0, duration=10.0, background=True, seed=0):
+        self.rows = rows
+        self.noise = noise
+        self.amplitude = amplitude
+        self.duration = duration
+        self.background = background
+        self.random = np.random.default_rng(seed)
+        self.columns = self.columnNames(width)
+
+    # width data columns, the intensity is counted up once every color and
+    # fps combination has been used so the names are always unique
+    def columnNames(self, width):
+        names = []
+        for i in range(width):
+            combination = i % (len(colors) * len(framesPerSecond))
+            color = colors[combination // len(framesPerSecond)]
+            fps = framesPerSecond[combination % len(framesPerSecond)]
+            intensity = i // (len(colors) * len(framesPerSecond)) + 1
+            names.append(color + '_' + str(intensity) + '_' + str(fps))
+        return names
+
+    # same as PeakAnalyzer.requiredPeaks
+    def expectedPeaks(self, column):
+        return math.ceil(int(column.split('_')[2]) / 5.0)
+
+    def timeData(self):
+        return np.linspace(0, self.duration, self.rows)
+
+    # whole periods starting halfway between a maximum and a minimum, so every
+    # minimum is followed by its maximum
+    def columnData(self, column):
+        phase = 2 * np.pi * self.expectedPeaks(column) * np.linspace(0, 1, self.rows)
+        return -self.amplitude * np.sin(phase) + self.random.normal(0, self.noise, self.rows)
+
+    def backgroundData(self):
+        return self.random.normal(1, self.noise * 5, self.rows)
+
+    def writeCsv(self, path):
+        fieldnames = ['Time']
+        data = [self.timeData()]
+        for column in self.columns:
+            fieldnames.append(column)
+            data.append(self.columnData(column))
+            if self.background:
+                fieldnames.append(column + 'B')
+                data.append(self.backgroundData())
+
+        with open(path, mode='w') as csv_file:
+            csv_file.write(','.join(fieldnames) + '\n')
+            np.savetxt(csv_file, np.array(data).T, fmt='%.6f', delimiter=',')
+        return path
\ No newline at end of file
@@ -0,0 +1,87 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import numpy as np
+
+REPORT_FILENAME = 'timing_report.json'
+
+# Records how long each stage of a session takes, per column. Timing is off
+# unless enable() is called, measure() then hands back the same do nothing
+# context every time so the hooks cost next to nothing.
+class Timing:
+    def __init__(self):
+        self.enabled = False
+        self.column = None
+        # (stage, column, seconds)
+        self.records = []
+        self.lock = threading.Lock()
+        self.disabledContext = contextlib.nullcontext()
+
+    def enable(self):
+        self.enabled = True
+
+    # the column that stages are recorded for unless they name their own
+    def setColumn(self, column):
+        self.column = column
+
+    def measure(self, stage, column=None):
+        if not self.enabled:
+            return self.disabledContext
+        return self.measuring(stage, column if column != None else self.column)
+
+    @contextlib.contextmanager
+    def measuring(self, stage, column):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.records.append((stage, column, seconds))
+
+    def summarize(self, seconds):
+        seconds = np.array(seconds)
+        return {
+            'count': len(seconds),
+            'total': float(seconds.sum()),
+            'mean': float(seconds.mean()),
+            'p50': float(np.percentile(seconds, 50)),
+            'p90': float(np.percentile(seconds, 90)),
+            'p99': float(np.percentile(seconds, 99)),
+            'max': float(seconds.max())
+        }
+
+    # {'stages': {stage: summary}, 'columns': {column: {stage: summary}}}
+    def report(self):
+        with self.lock:
+            records = list(self.records)
+
+        stages = {}
+        columns = {}
+        for stage, column, seconds in records:
+            stages.setdefault(stage, []).append(seconds)
+            # stages that work on the whole file are recorded with an empty column
+            if column != None and column != '':
+                columns.setdefault(column, {}).setdefault(stage, []).append(seconds)
+
+        return {
+            'stages': {stage: self.summarize(seconds) for stage, seconds in stages.items()},
+            'columns': {column: {stage: self.summarize(seconds) for stage, seconds in columnStages.items()} for column, columnStages in columns.items()}
+        }
+
+    def writeReport(self, outputDirectory):
+        if not self.enabled:
+            return
+        output = os.path.join(outputDirectory, REPORT_FILENAME)
+        try:
+            with open(output, mode='w') as reportFile:
+                json.dump(self.report(), reportFile, indent=2)
+            print("Timing report written to " + output)
+        except Exception as e:
+            print("ERROR: There was an error outputing to ", output)
+            print(e)
+
+# shared by every module of the session
+timer = Timing()
\ No newline at end of file
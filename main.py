@@ -1,13 +1,115 @@
 import argparse
-import BirdData
+import os
 
 parser = argparse.ArgumentParser(allow_abbrev=False)
-parser.add_argument("source", type=str, help="Source file to get data from.")
-parser.add_argument("-o", "--output", type=str, help="Directory to output to. Defaults to source input file name in the current directory.")
-parser.add_argument('-b', help="Process background columns.", action='store_true')
+parser.add_argument("source", type=str, nargs='+', help="Source file(s) to get data from. Only --batch accepts more than one. With --watch the directory to watch.")
+parser.add_argument("-o", "--output", type=str, help="Directory to output to. Defaults to source input file name in the current directory. With several source files each one gets a sub directory.")
+parser.add_argument('-b', help="Process background columns. With --batch the average and variance of every background column is written to background_data.csv, reading each file only once.", action='store_true')
 parser.add_argument("-c", '--columns', nargs='+', default=None, help="Supply specific columns instead of iterating through all available columns.")
 parser.add_argument('-s', "--start", type=str, default=None, help="Column to start at.")
 parser.add_argument('-n', action='store_true', default=False, help="Don't save graph image output.")
-args = vars(parser.parse_args())
+parser.add_argument('--resume', action='store_true', default=False, help="Continue an earlier session in the existing -o directory, columns that were already saved are passed over.")
+parser.add_argument('--image-format', type=str, default='png', help="File format of the saved graph images, e.g. png, pdf or svg.")
+parser.add_argument('--dpi', type=float, default=None, help="Resolution of the saved graph images. Defaults to matplotlib's figure dpi.")
+parser.add_argument('--npz', action='store_true', default=False, help="Also write the results to plot_data.npz for loading with numpy.")
+parser.add_argument('--parquet', action='store_true', default=False, help="Also write the results to plot_data.parquet, needs pyarrow.")
+parser.add_argument('--sqlite', type=str, default=None, help="Also add the results to this sqlite database, which collects the results of every run for querying across files.")
+parser.add_argument('--float32', action='store_true', default=False, help="Store the parsed data as 32 bit floats to halve memory usage.")
+parser.add_argument('--cache', action='store_true', default=False, help="Cache the parsed source file next to it so reopening it is fast.")
+parser.add_argument('--cache-dir', type=str, default=None, help="Directory to keep the parsed source file cache in. Implies --cache.")
+parser.add_argument('--lazy', action='store_true', default=False, help="Only read columns from the source file as they are plotted, for files that don't fit in memory.")
+parser.add_argument('--memory-budget', type=float, default=None, help="Megabytes of column data to keep loaded in --lazy mode before the least recently used columns are dropped.")
+parser.add_argument('--prominence', choices=['sweep', 'single', 'exact'], default='single', help="How the automatic prominences are found. 'single' gives the same result as the original 0.1 step 'sweep' much faster, 'exact' doesn't round to 0.1 steps.")
+parser.add_argument('--prefetch', type=int, default=1, help="Number of upcoming columns to load and analyze in the background while a column is being edited. 0 turns prefetching off.")
+parser.add_argument('--prefetch-previous', action='store_true', default=False, help="Also prefetch the previous column.")
+parser.add_argument('--timing', action='store_true', default=False, help="Time every stage of the interactive session and write timing_report.json to the output directory on exit.")
+parser.add_argument('--record', type=str, default=None, help="Write every click, slider drag and button press of the interactive session to this file so it can be replayed with --replay.")
+parser.add_argument('--replay', type=str, default=None, help="Replay a session written by --record against the source file without showing it and write the time every event took to handle, and the resulting peaks, to replay_report.json in -o.")
+parser.add_argument('--expect', type=str, default=None, help="replay_report.json of an earlier --replay that the peaks have to match, the replay fails when they don't.")
+parser.add_argument('--backend', type=str, default=None, help="matplotlib backend for the interactive plot, e.g. TkAgg or QtAgg. --batch, --watch, --overview and --replay always use Agg.")
+parser.add_argument('--overview', action='store_true', default=False, help="Render pages of small plots of every column, colored by whether they pass validation, to the overview directory of -o and list the columns that need attention.")
+parser.add_argument('--page-size', type=int, default=24, help="Number of columns on each --overview page.")
+parser.add_argument('--batch', action='store_true', default=False, help="Run the automatic interpretation on every column without showing any plots.")
+parser.add_argument('--workers', type=int, default=None, help="Number of worker processes used by --batch, --watch and --overview. Defaults to the number of CPUs.")
+parser.add_argument('--watch', action='store_true', default=False, help="Keep watching the source directory and run --batch on every recording that is added to it. Each recording gets its own directory in -o, which defaults to a results directory inside the watched one.")
+parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds between checks of the --watch directory. A file is processed once it hasn't changed for two checks.")
 
-BirdData.BirdData(args['source'], columns=args['columns'], outputDirectory=args['output'], background=args['b'], startColumn = args['start'], saveImages = not args['n'])
\ No newline at end of file
+# worker processes import this module again so nothing may run on import
+if __name__ == '__main__':
+    args = vars(parser.parse_args())
+
+    if args['watch'] and (len(args['source']) > 1 or not os.path.isdir(args['source'][0])):
+        parser.error("--watch takes a single directory as the source.")
+    if len(args['source']) > 1 and not args['batch']:
+        parser.error("Only --batch can process more than one source file.")
+    if args['overview'] and (len(args['source']) > 1 or args['batch'] or args['watch'] or args['resume'] or args['b']):
+        parser.error("--overview takes a single source file and can't be used with --batch, --watch, --resume or -b.")
+    if (args['record'] != None or args['replay'] != None) and (len(args['source']) > 1 or args['batch'] or args['watch'] or args['overview']):
+        parser.error("--record and --replay take a single source file and can't be used with --batch, --watch or --overview.")
+    if args['record'] != None and args['replay'] != None:
+        parser.error("--record and --replay can't be used together.")
+    if args['expect'] != None and args['replay'] == None:
+        parser.error("--expect needs --replay.")
+    if args['timing'] and (args['batch'] or args['watch'] or args['overview'] or args['replay'] != None):
+        parser.error("--timing only works for interactive sessions, the work of --batch, --watch and --overview happens in worker processes that aren't timed. --replay reports its own timings.")
+    if args['page_size'] < 1:
+        parser.error("--page-size has to be at least 1.")
+    if args['workers'] != None and args['workers'] < 1:
+        parser.error("--workers has to be at least 1.")
+    if args['resume'] and (args['output'] == None or args['batch'] or args['watch']):
+        parser.error("--resume needs the -o directory of the session to continue and can't be used with --batch or --watch.")
+
+    extractorOptions = {
+        'float32': args['float32'],
+        'cache': args['cache'],
+        'cacheDirectory': args['cache_dir'],
+        'lazy': args['lazy'],
+        'memoryBudget': None if args['memory_budget'] == None else int(args['memory_budget'] * 1024 * 1024)
+    }
+
+    if args['timing']:
+        import Timing
+        Timing.timer.enable()
+
+    # options for how the results are written
+    outputOptions = {
+        'imageFormat': args['image_format'],
+        'dpi': args['dpi'],
+        'outputFormats': [x for x in ['npz', 'parquet'] if args[x]],
+        'sqlitePath': args['sqlite']
+    }
+
+    # Only the modules a mode needs are imported, matplotlib and scipy are slow
+    # to load. The backend is picked through the environment so it is also
+    # used by worker processes and costs nothing when nothing is plotted.
+    if args['watch'] or args['batch'] or args['overview'] or args['replay'] != None:
+        os.environ['MPLBACKEND'] = 'Agg'
+    elif args['backend'] != None:
+        os.environ['MPLBACKEND'] = args['backend']
+
+    if args['watch']:
+        import FolderWatcher
+        batchOptions = {
+            'columns': args['columns'],
+            'background': args['b'],
+            'startColumn': args['start'],
+            'saveImages': not args['n'],
+            'prominenceMode': args['prominence']
+        }
+        FolderWatcher.FolderWatcher(args['source'][0], outputDirectory=args['output'], pollInterval=args['poll_interval'], workers=args['workers'] if args['workers'] != None else os.cpu_count(),
+                                    batchOptions={**batchOptions, **outputOptions, **extractorOptions}).run()
+    elif args['replay'] != None:
+        import InteractionReplay
+        InteractionReplay.InteractionReplay(args['replay'], source=args['source'][0], outputDirectory=args['output'], expectPath=args['expect'], **extractorOptions)
+    elif args['overview']:
+        import Overview
+        Overview.Overview(args['source'][0], columns=args['columns'], outputDirectory=args['output'], startColumn=args['start'], workers=args['workers'], pageSize=args['page_size'], prominenceMode=args['prominence'],
+                          imageFormat=args['image_format'], dpi=args['dpi'], **extractorOptions)
+    elif args['batch']:
+        import BatchProcessor
+        BatchProcessor.BatchProcessor(args['source'], columns=args['columns'], outputDirectory=args['output'], background=args['b'], startColumn = args['start'], saveImages = not args['n'], workers=args['workers'], prominenceMode=args['prominence'], **outputOptions, **extractorOptions)
+    else:
+        import BirdData
+
+        BirdData.BirdData(args['source'][0], columns=args['columns'], outputDirectory=args['output'], background=args['b'], startColumn = args['start'], saveImages = not args['n'], prominenceMode=args['prominence'],
+                          prefetch=args['prefetch'], prefetchPrevious=args['prefetch_previous'], resume=args['resume'], recordPath=args['record'], **outputOptions, **extractorOptions)
\ No newline at end of file